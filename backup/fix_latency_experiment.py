@@ -7,6 +7,7 @@
 import os
 import shutil
 import matplotlib
+matplotlib.use("Agg")  # 只保存图片文件，使用非交互式Agg后端
 import matplotlib.pyplot as plt
 import platform
 from pathlib import Path
@@ -79,6 +80,10 @@ def organize_files():
         'latency_runtime_vs_datasize.png'
     ]
     
+    # 文件名到目标文件夹的映射
+    destinations = {name: OLD_RESULTS_DIR for name in original_files}
+    destinations.update((name, NEW_RESULTS_DIR) for name in latency_files)
+    
     # 移动文件到相应文件夹
     for file_name in os.listdir(RESULTS_DIR):
         file_path = os.path.join(RESULTS_DIR, file_name)
@@ -89,21 +94,25 @@ def organize_files():
                 print(f"跳过目录: {file_name}")
             continue
         
-        if file_name in original_files:
-            dest = os.path.join(OLD_RESULTS_DIR, file_name)
-            try:
-                shutil.copy2(file_path, dest)
-                print(f"复制文件 {file_name} 到原始实验文件夹")
-            except:
-                print(f"无法复制文件 {file_name}")
+        dest_dir = destinations.get(file_name)
+        if dest_dir is None and file_name.startswith('latency_'):
+            dest_dir = NEW_RESULTS_DIR
+        if dest_dir is None:
+            continue
         
-        elif file_name in latency_files or file_name.startswith('latency_'):
-            dest = os.path.join(NEW_RESULTS_DIR, file_name)
+        dest = os.path.join(dest_dir, file_name)
+        folder_name = "原始实验文件夹" if dest_dir == OLD_RESULTS_DIR else "延迟实验文件夹"
+        try:
+            # 同一文件系统内直接重命名，无需复制文件内容
+            os.replace(file_path, dest)
+            print(f"移动文件 {file_name} 到{folder_name}")
+        except OSError:
             try:
-                shutil.copy2(file_path, dest)
-                print(f"复制文件 {file_name} 到延迟实验文件夹")
-            except:
-                print(f"无法复制文件 {file_name}")
+                # 跨设备时回退到复制后删除
+                shutil.move(file_path, dest)
+                print(f"移动文件 {file_name} 到{folder_name}")
+            except Exception:
+                print(f"无法移动文件 {file_name}")
     
     print("文件整理完成")
 
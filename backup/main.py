@@ -12,7 +12,7 @@ import os
 from typing import List, Tuple, Optional
 
 from multiplicative_group import PrimeOrderCyclicGroup
-from utils import setup_logging
+from utils import setup_logging, install_fast_loop
 from protocol_extension import secure_lagrange_interpolation
 from config import (
     DEFAULT_PRIME, DEFAULT_GENERATOR, 
@@ -124,6 +124,9 @@ def main() -> None:
         # 配置日志
         setup_logging(filename='lagrange_protocol.log', console_output=True)
         
+        # 使用uvloop加速（如果可用）
+        install_fast_loop()
+        
         # 尝试从命令行参数获取参与方数量
         party_num = None
         if len(sys.argv) > 1:
@@ -3,43 +3,67 @@
 """
 
 import asyncio
+import math
 import random
-import zlib
 import time
-from typing import Optional, Dict, Any, Union, Tuple, List, Callable
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Optional, Union, List
 
+# numpy为可选依赖，可用时批量生成随机数
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# 随机数缓冲区大小
+RAND_BUFFER_SIZE = 8192
+
+# 各类数据的压缩率分布 (均值, 标准差)，模拟压缩时按数据类别采样
+COMPRESSION_PROFILES = {
+    "numeric": (0.55, 0.05),  # 数字字符串，压缩率约在40-70%之间
+    "text": (0.30, 0.08),
+    "binary": (0.90, 0.05),
+}
+
+# 采样压缩率的截断区间
+MIN_COMPRESSION_RATIO = 0.1
+MAX_COMPRESSION_RATIO = 0.95
+
+@dataclass(frozen=True, slots=True)
 class NetworkCondition:
-    """网络环境条件配置类"""
+    """
+    网络环境条件配置类
     
-    def __init__(
-        self,
-        name: str,
-        min_delay: float = 0.0,
-        max_delay: float = 0.0,
-        packet_loss_rate: float = 0.0,
-        bandwidth_limit_kbps: Optional[int] = None
-    ):
-        """
-        初始化网络环境配置
-        
-        Args:
-            name: 环境名称
-            min_delay: 最小延迟(秒)
-            max_delay: 最大延迟(秒)
-            packet_loss_rate: 丢包率 (0.0-1.0)
-            bandwidth_limit_kbps: 带宽限制(kbps)，None表示不限制
-        """
-        self.name = name
-        self.min_delay = min_delay
-        self.max_delay = max_delay
-        self.packet_loss_rate = min(1.0, max(0.0, packet_loss_rate))
-        self.bandwidth_limit_kbps = bandwidth_limit_kbps
+    Attributes:
+        name: 环境名称
+        min_delay: 最小延迟(秒)
+        max_delay: 最大延迟(秒)
+        packet_loss_rate: 丢包率 (0.0-1.0)
+        bandwidth_limit_kbps: 带宽限制(kbps)，None表示不限制
+    """
+    name: str
+    min_delay: float = 0.0
+    max_delay: float = 0.0
+    packet_loss_rate: float = 0.0
+    bandwidth_limit_kbps: Optional[int] = None
+    
+    # 构造后各字段不再变化，字符串表示只需生成一次
+    _str_cache: Optional[str] = field(default=None, init=False, repr=False, compare=False)
+    
+    def __post_init__(self):
+        """将丢包率限制在 [0.0, 1.0] 区间内"""
+        object.__setattr__(self, 'packet_loss_rate', min(1.0, max(0.0, self.packet_loss_rate)))
     
     def __str__(self) -> str:
         """返回网络环境的可读字符串表示"""
-        bw_str = f"{self.bandwidth_limit_kbps} kbps" if self.bandwidth_limit_kbps else "无限制"
-        return (f"{self.name}: 延迟={self.min_delay*1000:.0f}-{self.max_delay*1000:.0f}ms, "
-                f"丢包率={self.packet_loss_rate*100:.1f}%, 带宽={bw_str}")
+        if self._str_cache is None:
+            bw_str = f"{self.bandwidth_limit_kbps} kbps" if self.bandwidth_limit_kbps else "无限制"
+            object.__setattr__(self, '_str_cache', (
+                f"{self.name}: 延迟={self.min_delay*1000:.0f}-{self.max_delay*1000:.0f}ms, "
+                f"丢包率={self.packet_loss_rate*100:.1f}%, 带宽={bw_str}"
+            ))
+        return self._str_cache
 
 
 # 预定义网络环境
@@ -124,25 +148,86 @@ class NetworkSimulator:
         # 数据压缩选项
         self.use_compression = use_compression
         
-        # 缓存系统
-        self.cache = {}
-        self.last_send_time = 0
-        self.traffic_queue = []  # 限流队列
+        # 无延迟、无丢包、无带宽限制的网络条件下模拟不产生任何效应，可直接跳过
+        self._is_noop = (
+            self.condition.min_delay == 0
+            and self.condition.max_delay == 0
+            and self.condition.packet_loss_rate == 0
+            and self.condition.bandwidth_limit_kbps is None
+        )
         
-        # 限制缓存大小
-        self.max_cache_size = 100
+        # 令牌桶带宽模型：每秒补充 kbps*125 字节的令牌，桶容量为一秒的流量
+        bandwidth_kbps = self.condition.bandwidth_limit_kbps
+        self._bytes_per_second = bandwidth_kbps * 125.0 if bandwidth_kbps else math.inf
+        self._inv_bytes_per_second = 1.0 / self._bytes_per_second  # 预先求倒数，等待时间只需一次乘法
+        self._bucket_capacity = self._bytes_per_second
+        self._tokens = self._bucket_capacity
+        self._last_refill = time.monotonic()
         
         # 性能统计
         self.compressed_bytes = 0
         self.original_bytes = 0
-        self.bandwidth_delays = []  # 带宽延迟记录
+        self.bandwidth_delays = deque(maxlen=100)  # 带宽延迟记录，仅保留最近100次
+        
+        # 随机数缓冲区，批量采样以摊销逐次调用的开销
+        self._rng = np.random.default_rng() if np is not None else None
+        self._rand_buf: List[float] = []
+        self._rand_idx = 0
     
-    def compress_data(self, data_size: int) -> int:
+    def _next_rand(self) -> float:
+        """
+        返回[0, 1)区间内的随机数，numpy可用时从预生成的缓冲区中取值
+        
+        Returns:
+            随机浮点数
+        """
+        if self._rng is None:
+            return random.random()
+        if self._rand_idx >= len(self._rand_buf):
+            self._rand_buf = self._rng.random(RAND_BUFFER_SIZE).tolist()
+            self._rand_idx = 0
+        value = self._rand_buf[self._rand_idx]
+        self._rand_idx += 1
+        return value
+    
+    def _consume(self, nbytes: int) -> float:
+        """
+        从令牌桶中取出nbytes字节的令牌
+        
+        令牌不足时记为欠额，后续数据包需排在其后等待，从而模拟带宽排队
+        
+        Args:
+            nbytes: 发送的字节数
+            
+        Returns:
+            因带宽限制需要等待的时间(秒)
+        """
+        if self._inv_bytes_per_second == 0.0:
+            return 0.0
+        
+        now = time.monotonic()
+        self._tokens = min(
+            self._bucket_capacity,
+            self._tokens + (now - self._last_refill) * self._bytes_per_second
+        )
+        self._last_refill = now
+        
+        self._tokens -= nbytes
+        if self._tokens >= 0:
+            return 0.0
+        return -self._tokens * self._inv_bytes_per_second
+    
+    def _uniform(self, a: float, b: float) -> float:
+        """返回[a, b)区间内均匀分布的随机数"""
+        return a + (b - a) * self._next_rand()
+    
+    def compress_data(self, data_size: int, data_class: str = "numeric") -> int:
         """
         模拟数据压缩，返回压缩后的大小
         
         Args:
             data_size: 原始数据大小
+            data_class: 数据类别，见COMPRESSION_PROFILES
         
         Returns:
             压缩后的数据大小
@@ -150,9 +235,13 @@ class NetworkSimulator:
         if not self.use_compression:
             return data_size
             
-        # 实际应用中，压缩率因数据内容而异，这里使用一个简化的模拟
-        # 对于数字数据，假设压缩率在40-70%之间
-        compression_ratio = random.uniform(0.4, 0.7)
+        # 实际应用中，压缩率因数据内容而异，这里按数据类别的压缩率分布采样
+        mean, std = COMPRESSION_PROFILES[data_class]
+        if self._rng is not None:
+            compression_ratio = self._rng.normal(mean, std)
+        else:
+            compression_ratio = random.gauss(mean, std)
+        compression_ratio = min(MAX_COMPRESSION_RATIO, max(MIN_COMPRESSION_RATIO, compression_ratio))
         compressed_size = int(data_size * compression_ratio)
         
         # 更新统计信息
@@ -178,24 +267,19 @@ class NetworkSimulator:
         Returns:
             是否成功传输(True)或丢包(False)
         """
+        if self._is_noop:
+            return True
+        
         # 如果启用了压缩，计算压缩后的数据大小
         effective_data_size = self.compress_data(data_size_bytes) if self.use_compression else data_size_bytes
         
-        # 检查缓存
-        data_hash = hash(f"{effective_data_size}_{time.time_ns() % 10000}")  # 简单模拟数据标识
-        if data_hash in self.cache:
-            # 缓存命中，只需模拟小延迟
-            await asyncio.sleep(self.condition.min_delay * 0.1)  # 缓存命中时的延迟大幅减少
-            return True
-        
-        # 缓存管理
-        if len(self.cache) > self.max_cache_size:
-            # LRU缓存清理策略
-            oldest_key = next(iter(self.cache))
-            del self.cache[oldest_key]
+        # 将热路径上用到的网络条件字段读入局部变量
+        condition = self.condition
+        min_delay, max_delay = condition.min_delay, condition.max_delay
         
+        # 每个数据包都完整模拟延迟和丢包，不因数据包大小相同而跳过
         # 优化策略
-        packet_loss_threshold = self.condition.packet_loss_rate
+        packet_loss_threshold = condition.packet_loss_rate
         if optimize_for == "speed":
             # 速度优先，减少延迟
             delay_factor = 0.8
@@ -207,41 +291,17 @@ class NetworkSimulator:
         else:  # balanced
             delay_factor = 1.0
         
-        # 模拟带宽和设备最大并发连接限制
-        current_time = time.time()
-        if self.condition.bandwidth_limit_kbps:
-            # 限流控制
-            if self.traffic_queue and (current_time - self.last_send_time) < 0.05:  # 50ms 内
-                # 如果有队列中的流量且时间间隔很短，模拟带宽畅通率下降
-                if random.random() < 0.3:  # 30% 几率模拟转发瓶颈
-                    return False
-        
         # 模拟丢包
         for attempt in range(max_retries + 1):
-            if random.random() >= packet_loss_threshold:
+            if self._next_rand() >= packet_loss_threshold:
                 # 计算随机延迟
-                base_delay = random.uniform(
-                    self.condition.min_delay, 
-                    self.condition.max_delay
-                ) * delay_factor
+                base_delay = self._uniform(min_delay, max_delay) * delay_factor
                 
-                # 计算带宽引起的延迟
-                bandwidth_delay = 0
-                if self.condition.bandwidth_limit_kbps:
-                    # 核心带宽计算公式
-                    bandwidth_delay = (effective_data_size * 8) / (self.condition.bandwidth_limit_kbps * 1000)
-                    
-                    # 添加带宽波动
-                    jitter = random.uniform(-0.1, 0.2) * bandwidth_delay
-                    bandwidth_delay += jitter
-                    
-                    # 更新最后发送时间
-                    self.last_send_time = current_time
-                    
-                    # 记录带宽延迟
+                # 通过令牌桶计算带宽引起的排队延迟
+                bandwidth_delay = self._consume(effective_data_size)
+                if condition.bandwidth_limit_kbps:
+                    # 记录带宽延迟(deque自动淘汰最早的记录)
                     self.bandwidth_delays.append(bandwidth_delay)
-                    if len(self.bandwidth_delays) > 100:
-                        self.bandwidth_delays.pop(0)  # 保持最近100次记录
                 
                 # 总延迟
                 total_delay = base_delay + bandwidth_delay
@@ -249,9 +309,6 @@ class NetworkSimulator:
                 # 模拟延迟
                 await asyncio.sleep(total_delay)
                 
-                # 更新缓存
-                self.cache[data_hash] = current_time
-                
                 return True
             elif attempt < max_retries:
                 # 请求失败但还可以重试
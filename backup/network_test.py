@@ -5,12 +5,12 @@
 import time
 import asyncio
 import logging
-import json
 import os
 import platform
 from typing import List, Dict, Any, Tuple, Optional
-import matplotlib.pyplot as plt
 import matplotlib
+matplotlib.use("Agg")  # 只保存图片文件，使用非交互式Agg后端
+import matplotlib.pyplot as plt
 import numpy as np
 
 # 配置matplotlib支持中文
@@ -35,7 +35,7 @@ except Exception as e:
     print(f"警告: 配置中文字体失败: {e}，将使用默认字体")
 
 from multiplicative_group import PrimeOrderCyclicGroup
-from utils import setup_logging, generate_triples
+from utils import setup_logging, generate_triples, install_fast_loop, dumps_pretty
 from protocol_extension import secure_lagrange_interpolation
 from network_simulator import NETWORK_CONDITIONS
 from config import DEFAULT_PRIME, DEFAULT_GENERATOR, DEFAULT_X_STAR
@@ -76,72 +76,58 @@ async def run_network_test(
     """
     logger.info(f"开始网络测试: 参与方数量={party_count}, 网络类型={network_type}")
     
+    network_condition = NETWORK_CONDITIONS[network_type]
+    
     # 准备数据点
     points = [(i, i**2) for i in range(1, party_count+1)]
     
-    # 存储多次测试结果
-    run_times = []
-    success_rates = []
-    send_data_sizes = []
-    recv_data_sizes = []
+    # 存储多次测试结果，失败的运行时间记为NaN，数据量记为0
+    run_times = np.full(repeat_count, np.nan)
+    send_data_sizes = np.zeros(repeat_count)
+    recv_data_sizes = np.zeros(repeat_count)
     
     # 重复测试多次以获得可靠结果
     for i in range(repeat_count):
         try:
-            # 替换掉原始的participant模块，使用支持网络模拟的版本
-            # 这里通过设置环境变量告诉协议使用增强版的参与方
-            os.environ['USE_NETWORK_SIMULATION'] = 'True'
-            os.environ['NETWORK_TYPE'] = network_type
+            start_time = time.perf_counter_ns()  # 单调时钟，纳秒整数
             
-            start_time = time.time()
-            
-            # 运行插值协议
-            result = await secure_lagrange_interpolation(
+            # 运行插值协议，网络条件直接传入，使用支持网络模拟的增强版参与方
+            result, stats = await secure_lagrange_interpolation(
                 points, 
                 DEFAULT_X_STAR,
                 DEFAULT_PRIME,
-                DEFAULT_GENERATOR
+                DEFAULT_GENERATOR,
+                network_condition=network_condition,
+                return_stats=True
             )
             
-            end_time = time.time()
-            run_time = end_time - start_time
-            
-            # 收集结果
-            run_times.append(run_time)
-            success_rates.append(1.0)  # 成功完成
+            end_time = time.perf_counter_ns()
+            run_time = (end_time - start_time) / 1e9
             
-            # 通信统计数据需要从增强参与方中收集
-            # 这里假设我们会在secure_lagrange_interpolation函数中记录这些信息
-            # 并通过环境变量返回
-            if 'TOTAL_SEND_BYTES' in os.environ:
-                send_data_sizes.append(int(os.environ.get('TOTAL_SEND_BYTES', '0')))
-            if 'TOTAL_RECV_BYTES' in os.environ:
-                recv_data_sizes.append(int(os.environ.get('TOTAL_RECV_BYTES', '0')))
+            # 收集结果，通信统计数据由插值协议直接返回
+            run_times[i] = run_time
+            send_data_sizes[i] = stats["send_bytes"]
+            recv_data_sizes[i] = stats["recv_bytes"]
                 
             logger.info(f"测试 {i+1}/{repeat_count} 完成: 运行时间={run_time:.2f}秒")
             
         except Exception as e:
             logger.error(f"测试 {i+1}/{repeat_count} 失败: {str(e)}")
-            # 记录失败
-            run_times.append(None)
-            success_rates.append(0.0)
-            send_data_sizes.append(0)
-            recv_data_sizes.append(0)
     
-    # 计算统计结果
-    success_rate = sum(sr for sr in success_rates if sr is not None) / repeat_count
-    valid_run_times = [rt for rt in run_times if rt is not None]
+    # 计算统计结果，全部失败时各时间统计为None
+    success_count = int(np.count_nonzero(~np.isnan(run_times)))
+    success_rate = success_count / repeat_count
     
     result = {
         "party_count": party_count,
         "network_type": network_type,
-        "network_condition": str(NETWORK_CONDITIONS[network_type]),
-        "avg_run_time": sum(valid_run_times) / len(valid_run_times) if valid_run_times else None,
-        "min_run_time": min(valid_run_times) if valid_run_times else None,
-        "max_run_time": max(valid_run_times) if valid_run_times else None,
+        "network_condition": str(network_condition),
+        "avg_run_time": float(np.nanmean(run_times)) if success_count else None,
+        "min_run_time": float(np.nanmin(run_times)) if success_count else None,
+        "max_run_time": float(np.nanmax(run_times)) if success_count else None,
         "success_rate": success_rate,
-        "avg_send_data_size": sum(send_data_sizes) / len(send_data_sizes) if send_data_sizes else 0,
-        "avg_recv_data_size": sum(recv_data_sizes) / len(recv_data_sizes) if recv_data_sizes else 0,
+        "avg_send_data_size": float(send_data_sizes.mean()) if repeat_count else 0,
+        "avg_recv_data_size": float(recv_data_sizes.mean()) if repeat_count else 0,
     }
     
     logger.info(f"网络测试结果: {result}")
@@ -151,6 +137,9 @@ async def run_all_tests(output_file: str = "network_test_results.json") -> List[
     """
     运行所有测试场景
     
+    各场景依次串行执行：并发运行会互相争抢事件循环和CPU，污染计时结果，
+    且所有场景共用 PortManager 的端口范围，并发时可能耗尽
+    
     Args:
         output_file: 结果输出文件
         
@@ -161,16 +150,17 @@ async def run_all_tests(output_file: str = "network_test_results.json") -> List[
     os.makedirs(RESULTS_DIR, exist_ok=True)
     
     all_results = []
+    output_path = os.path.join(RESULTS_DIR, output_file)
     
     # 对每种网络条件和参与方数量进行测试
     for network_type in TEST_NETWORK_TYPES:
         for party_count in TEST_PARTY_COUNTS:
             result = await run_network_test(party_count, network_type)
             all_results.append(result)
-            
-            # 保存中间结果
-            with open(os.path.join(RESULTS_DIR, output_file), 'w') as f:
-                json.dump(all_results, f, indent=2)
+        
+        # 每完成一种网络条件保存一次中间结果，而不是每个测试都重写整个文件
+        with open(output_path, 'wb') as f:
+            f.write(dumps_pretty(all_results))
     
     return all_results
 
@@ -194,22 +184,27 @@ def plot_results(results: List[Dict[str, Any]], prefix: str = "") -> None:
     # 按网络类型分组结果
     network_types = list(set(r["network_type"] for r in results))
     party_counts = sorted(list(set(r["party_count"] for r in results)))
+    net_names = {net_type: NETWORK_CONDITIONS[net_type].name for net_type in network_types}
+    
+    # 遍历一次结果，构建 网络类型×参与方数量 的数据矩阵，缺失数据记为0
+    net_index = {net_type: i for i, net_type in enumerate(network_types)}
+    party_index = {party_count: j for j, party_count in enumerate(party_counts)}
+    shape = (len(network_types), len(party_counts))
+    run_time_matrix = np.zeros(shape)
+    success_rate_matrix = np.zeros(shape)
+    data_size_matrix = np.zeros(shape)
+    
+    for r in results:
+        i, j = net_index[r["network_type"]], party_index[r["party_count"]]
+        run_time_matrix[i, j] = r["avg_run_time"] if r["avg_run_time"] else 0
+        success_rate_matrix[i, j] = r["success_rate"]
+        data_size_matrix[i, j] = r["avg_send_data_size"] / 1024  # 转换为KB
     
     # 1. 绘制运行时间图
-    plt.figure(figsize=(12, 8))
-    
-    for net_type in network_types:
-        # 提取当前网络类型的数据
-        times = []
-        for party_count in party_counts:
-            for r in results:
-                if r["network_type"] == net_type and r["party_count"] == party_count:
-                    times.append(r["avg_run_time"] if r["avg_run_time"] else 0)
-                    break
-            else:
-                times.append(0)  # 如果没找到匹配数据
-                
-        plt.plot(party_counts, times, marker='o', label=NETWORK_CONDITIONS[net_type].name)
+    fig = plt.figure(figsize=(12, 8), dpi=100)
+    
+    for i, net_type in enumerate(network_types):
+        plt.plot(party_counts, run_time_matrix[i], marker='o', label=net_names[net_type])
     
     plt.xlabel('参与方数量')
     plt.ylabel('平均运行时间 (秒)')
@@ -217,21 +212,13 @@ def plot_results(results: List[Dict[str, Any]], prefix: str = "") -> None:
     plt.grid(True)
     plt.legend()
     plt.savefig(os.path.join(RESULTS_DIR, f'{prefix}runtime_comparison.png'))
+    plt.close(fig)
     
     # 2. 绘制成功率图
-    plt.figure(figsize=(12, 8))
-    
-    for net_type in network_types:
-        rates = []
-        for party_count in party_counts:
-            for r in results:
-                if r["network_type"] == net_type and r["party_count"] == party_count:
-                    rates.append(r["success_rate"])
-                    break
-            else:
-                rates.append(0)
-                
-        plt.plot(party_counts, rates, marker='o', label=NETWORK_CONDITIONS[net_type].name)
+    fig = plt.figure(figsize=(12, 8), dpi=100)
+    
+    for i, net_type in enumerate(network_types):
+        plt.plot(party_counts, success_rate_matrix[i], marker='o', label=net_names[net_type])
     
     plt.xlabel('参与方数量')
     plt.ylabel('协议成功率')
@@ -239,21 +226,13 @@ def plot_results(results: List[Dict[str, Any]], prefix: str = "") -> None:
     plt.grid(True)
     plt.legend()
     plt.savefig(os.path.join(RESULTS_DIR, f'{prefix}success_rate_comparison.png'))
+    plt.close(fig)
     
     # 3. 绘制通信量图
-    plt.figure(figsize=(12, 8))
-    
-    for net_type in network_types:
-        data_sizes = []
-        for party_count in party_counts:
-            for r in results:
-                if r["network_type"] == net_type and r["party_count"] == party_count:
-                    data_sizes.append(r["avg_send_data_size"] / 1024)  # 转换为KB
-                    break
-            else:
-                data_sizes.append(0)
-                
-        plt.plot(party_counts, data_sizes, marker='o', label=NETWORK_CONDITIONS[net_type].name)
+    fig = plt.figure(figsize=(12, 8), dpi=100)
+    
+    for i, net_type in enumerate(network_types):
+        plt.plot(party_counts, data_size_matrix[i], marker='o', label=net_names[net_type])
     
     plt.xlabel('参与方数量')
     plt.ylabel('平均发送数据量 (KB)')
@@ -261,57 +240,39 @@ def plot_results(results: List[Dict[str, Any]], prefix: str = "") -> None:
     plt.grid(True)
     plt.legend()
     plt.savefig(os.path.join(RESULTS_DIR, f'{prefix}communication_comparison.png'))
+    plt.close(fig)
     
     # 4. 绘制比较条形图
-    plt.figure(figsize=(14, 10))
-    
     # 每个网络类型分一个子图
-    fig, axes = plt.subplots(len(network_types), 1, figsize=(12, 3*len(network_types)))
+    fig, axes = plt.subplots(len(network_types), 1, figsize=(12, 3*len(network_types)), dpi=100)
+    axes = np.atleast_1d(axes)
     
     for i, net_type in enumerate(network_types):
-        ax = axes[i] if len(network_types) > 1 else axes
-        
-        # 获取数据
-        times = []
-        for party_count in party_counts:
-            for r in results:
-                if r["network_type"] == net_type and r["party_count"] == party_count:
-                    times.append(r["avg_run_time"] if r["avg_run_time"] else 0)
-                    break
-            else:
-                times.append(0)
+        ax = axes[i]
         
         # 绘制条形图
-        ax.bar(party_counts, times)
-        ax.set_title(f'网络环境: {NETWORK_CONDITIONS[net_type].name}')
+        ax.bar(party_counts, run_time_matrix[i])
+        ax.set_title(f'网络环境: {net_names[net_type]}')
         ax.set_xlabel('参与方数量')
         ax.set_ylabel('平均运行时间 (秒)')
         ax.grid(True, axis='y')
     
     plt.tight_layout()
     plt.savefig(os.path.join(RESULTS_DIR, f'{prefix}network_runtime_detail.png'))
+    plt.close(fig)
     
     # 5. 绘制热图
-    plt.figure(figsize=(10, 8))
-    
-    # 准备热图数据
-    heatmap_data = np.zeros((len(network_types), len(party_counts)))
-    
-    for i, net_type in enumerate(network_types):
-        for j, party_count in enumerate(party_counts):
-            for r in results:
-                if r["network_type"] == net_type and r["party_count"] == party_count:
-                    heatmap_data[i, j] = r["avg_run_time"] if r["avg_run_time"] else 0
-                    break
+    # 热图数据即运行时间矩阵
+    heatmap_data = run_time_matrix
     
-    fig, ax = plt.subplots(figsize=(10, 8))
+    fig, ax = plt.subplots(figsize=(10, 8), dpi=100)
     im = ax.imshow(heatmap_data)
     
     # 设置坐标轴标签
     ax.set_xticks(np.arange(len(party_counts)))
     ax.set_yticks(np.arange(len(network_types)))
     ax.set_xticklabels(party_counts)
-    ax.set_yticklabels([NETWORK_CONDITIONS[nt].name for nt in network_types])
+    ax.set_yticklabels([net_names[nt] for nt in network_types])
     
     # 旋转x轴标签
     plt.setp(ax.get_xticklabels(), rotation=45, ha="right", rotation_mode="anchor")
@@ -329,6 +290,7 @@ def plot_results(results: List[Dict[str, Any]], prefix: str = "") -> None:
     ax.set_title("不同网络环境和参与方数量下的运行时间热图")
     fig.tight_layout()
     plt.savefig(os.path.join(RESULTS_DIR, f'{prefix}runtime_heatmap.png'))
+    plt.close(fig)
 
 async def main():
     """主函数"""
@@ -348,4 +310,6 @@ async def main():
     return results
 
 if __name__ == "__main__":
+    # 使用uvloop加速（如果可用）
+    install_fast_loop()
     asyncio.run(main())
@@ -0,0 +1,251 @@
+"""
+协议公共模块 - 三方和四方协议共用的端口管理、资源释放和参与方池
+"""
+
+import logging
+import asyncio
+import os
+from typing import List, Tuple, Dict, Optional, Any
+
+from communication.async_socket_communication import PortManager
+from participant import Participant
+from utils import to_field
+from config import DEFAULT_RECV_TIMEOUT
+from protocol_factory import create_participant
+
+# 创建端口管理器实例
+port_manager = PortManager(min_port=6100, max_port=6200)
+
+# 初始化logger
+logger = logging.getLogger('lagrange_protocol')
+
+def setup_prss(participants: List[Participant]) -> bytes:
+    """
+    为本次计算的参与方两两建立PRSS共享种子，并返回新的会话标识
+    
+    种子只在缺失或两端不一致时生成，参与方池中复用的参与方沿用已建立的种子，
+    每次计算只需一个公开的会话标识区分各次派生的份额
+    
+    Args:
+        participants: 本次计算的参与方
+        
+    Returns:
+        会话标识
+    """
+    for idx, a in enumerate(participants):
+        for b in participants[idx + 1:]:
+            seed = a.prss_seeds.get(b.name)
+            if seed is None or b.prss_seeds.get(a.name) != seed:
+                seed = os.urandom(32)
+                a.prss_seeds[b.name] = seed
+                b.prss_seeds[a.name] = seed
+    return os.urandom(16)
+
+def prss_local_shares(
+    participant: Participant,
+    others: List[Participant],
+    session: bytes,
+    one_count: int,
+    zero_count: int
+) -> Tuple[Tuple, Tuple]:
+    """
+    参与方本地生成本次计算所需的全部1分享和0分享份额
+    
+    Args:
+        participant: 生成份额的参与方
+        others: 本次计算中的其他参与方
+        session: 会话标识
+        one_count: 1分享个数
+        zero_count: 0分享个数
+        
+    Returns:
+        (1分享份额, 0分享份额)，gmpy2可用时为mpz
+    """
+    peers = [other.name for other in others]
+    ones = to_field(*(participant.prss_one_share(peers, session, m) for m in range(one_count)))
+    zeros = to_field(*(participant.prss_zero_share(peers, session, m) for m in range(zero_count)))
+    return ones, zeros
+
+async def send_to_combiner(
+    sender: Participant,
+    combiner: Participant,
+    expected_count: int,
+    r_self: int,
+    zero_share: int,
+    sign: int,
+    prefix: List[int],
+    masked_last: int,
+    p: int
+) -> bool:
+    """
+    非组合方参与方的最后一步：接收其他参与方的乘法掩码后计算delta，
+    并将 prefix + [delta, masked_last] 合并为一条消息发送给组合方
+    
+    delta = zero_share + sign * r_self * Π(收到的掩码)
+    
+    Args:
+        sender: 发送方
+        combiner: 组合方(P_i)
+        expected_count: 需要接收的掩码数量
+        r_self: 发送方在1分享中对应自身的随机数
+        zero_share: 发送方的0分享
+        sign: 乘积项的符号(1或-1)
+        prefix: 原本需单独发往组合方的掩码
+        masked_last: (x^*-x)的掩码
+        p: 素数模数
+        
+    Returns:
+        是否收到足够掩码并完成发送
+    """
+    vals = to_field(*await sender.recv_values(expected_count, wait_sec=DEFAULT_RECV_TIMEOUT))
+    if len(vals) < expected_count:
+        logger.error(f"{sender.name} 未收到足够掩码, 协议中断. 仅收到 {len(vals)} 个值")
+        return False
+    
+    product = r_self
+    for v in vals:
+        product = (product * v) % p
+    delta = (zero_share + sign * product) % p
+    
+    await sender.send_values_bulk(combiner, [*prefix, delta, masked_last])
+    return True
+
+async def cleanup_resources(participants: List, ports: List[int]) -> None:
+    """
+    清理资源（关闭连接、释放端口）
+    
+    Args:
+        participants: 参与方列表
+        ports: 端口列表
+    """
+    # 创建关闭参与方的任务
+    close_tasks = [p.close() for p in participants]
+    
+    # 创建释放端口的任务
+    release_tasks = [port_manager.release_port(port) for port in ports]
+    
+    # 并行执行所有任务
+    await asyncio.gather(*close_tasks, *release_tasks, return_exceptions=True)
+
+async def release_resources(
+    participants: List,
+    ports: List[int],
+    pool: Optional['ParticipantPool'] = None,
+    reusable: bool = False
+) -> None:
+    """
+    计算任务结束时释放参与方
+    
+    使用参与方池时，成功的任务将参与方归还池中，失败的任务丢弃参与方；
+    否则关闭连接并释放端口
+    
+    Args:
+        participants: 参与方列表
+        ports: 端口列表
+        pool: 参与方池
+        reusable: 参与方是否可被后续任务复用
+    """
+    if pool is None:
+        await cleanup_resources(participants, ports)
+    elif reusable:
+        pool.release(participants)
+    else:
+        await pool.discard(participants)
+
+class ParticipantPool:
+    """
+    参与方池 - 按参与方标号复用已启动的参与方
+    
+    同一参与方会出现在多个三元组/四元组中，任务结束后参与方归还池中，
+    后续任务直接复用其已监听的端口和已建立的连接，避免重复分配端口和握手。
+    每个参与方实例同一时刻只被一个任务占用，各任务的接收队列互不干扰。
+    """
+    def __init__(self, x_star: int, q: int, **participant_kwargs: Any) -> None:
+        """
+        初始化参与方池
+        
+        Args:
+            x_star: 插值点坐标
+            q: 素数模数
+            participant_kwargs: 传递给create_participant的其他参数
+        """
+        self.x_star = x_star
+        self.q = q
+        self.participant_kwargs = participant_kwargs
+        self.idle: Dict[Tuple[str, int], List] = {}
+        self.participants: List = []
+        self.ports: List[int] = []
+    
+    async def _acquire_one(self, name: str, x: int):
+        """取出一个空闲参与方，没有时新建并启动"""
+        idle = self.idle.get((name, x % self.q))
+        if idle:
+            participant = idle.pop()
+            participant.comm.reset_stats()
+            return participant
+        
+        port = await port_manager.get_port()
+        self.ports.append(port)
+        participant = create_participant(name, port, x, self.x_star, self.q, **self.participant_kwargs)
+        self.participants.append(participant)
+        await participant.start()
+        return participant
+    
+    async def warm_up(self, parties: List[Tuple[str, int]]) -> None:
+        """
+        为每个真实参与方预先创建并并行启动一个参与方实例放入池中
+        后续任务优先复用这些实例，只有同一参与方同时被多个任务占用时才新建实例
+        
+        Args:
+            parties: (参与方名称, x) 列表
+        """
+        ports = [await port_manager.get_port() for _ in parties]
+        self.ports.extend(ports)
+        created = [
+            create_participant(name, port, x, self.x_star, self.q, **self.participant_kwargs)
+            for (name, x), port in zip(parties, ports)
+        ]
+        self.participants.extend(created)
+        await asyncio.gather(*(participant.start() for participant in created))
+        self.release(created)
+    
+    async def acquire(self, parties: List[Tuple[str, int]]) -> List:
+        """
+        为一次计算任务取出参与方
+        
+        Args:
+            parties: (参与方名称, x) 列表
+            
+        Returns:
+            与parties顺序一致的参与方列表
+        """
+        participants = []
+        try:
+            for name, x in parties:
+                participants.append(await self._acquire_one(name, x))
+        except Exception:
+            await self.discard(participants)
+            raise
+        return participants
+    
+    def release(self, participants: List) -> None:
+        """将参与方归还池中"""
+        for participant in participants:
+            self.idle.setdefault((participant.name, participant.x), []).append(participant)
+    
+    async def discard(self, participants: List) -> None:
+        """
+        关闭出错任务的参与方，不再复用
+        端口保留到池关闭时再释放，避免其他参与方的旧连接指向被重新分配的端口
+        """
+        for participant in participants:
+            if participant in self.participants:
+                self.participants.remove(participant)
+        await asyncio.gather(*(p.close() for p in participants), return_exceptions=True)
+    
+    async def close(self) -> None:
+        """关闭池中所有参与方并释放端口"""
+        await cleanup_resources(self.participants, self.ports)
+        self.idle.clear()
+        self.participants = []
+        self.ports = []
@@ -4,24 +4,106 @@
 
 import logging
 import asyncio
+import functools
 import time
 import os
 from typing import List, Tuple, Dict, Optional, Union, Any
 
+# gmpy2为可选依赖，可用时使用GMP大整数加速模运算
+try:
+    import gmpy2
+except ImportError:
+    gmpy2 = None
+
 from multiplicative_group import PrimeOrderCyclicGroup
 from communication.async_socket_communication import PortManager
 from participant import Participant
-from utils import mini_one_share, mini_zero_share, generate_triples
+from utils import generate_triples, to_field, batch_invert
 from config import (
     DEFAULT_RECV_TIMEOUT, DEFAULT_PRIME, DEFAULT_GENERATOR,
     MIN_PARTIES, MAX_PARTIES
 )
-from protocol import port_manager, cleanup_resources
+from network_simulator import NetworkCondition
+from protocol_common import (
+    port_manager, release_resources, ParticipantPool, send_to_combiner,
+    setup_prss, prss_local_shares
+)
+from protocol import three_party_compute
 from protocol_factory import create_participant
 
 # 初始化logger
 logger = logging.getLogger('lagrange_protocol')
 
+def _diff_tables(xs: Tuple[int, ...], x_star: int, p: int) -> Tuple[Tuple[int, ...], Tuple[Tuple[int, ...], ...]]:
+    """
+    计算拉格朗日插值所需的差值表，结果随lagrange_basis_coefficients一并缓存
+    
+    Args:
+        xs: 各参与方的x坐标
+        x_star: 插值点
+        p: 素数模数
+        
+    Returns:
+        (numer_diffs, denom_diffs)，numer_diffs[i] = (x^*-x_i) mod p，
+        denom_diffs[i] 为所有 j!=i 的 (x_i-x_j) mod p
+    """
+    numer_diffs = tuple((x_star - xj) % p for xj in xs)
+    denom_diffs = tuple(
+        tuple((xi - xj) % p for j, xj in enumerate(xs) if j != i)
+        for i, xi in enumerate(xs)
+    )
+    return numer_diffs, denom_diffs
+
+@functools.lru_cache(maxsize=32)
+def lagrange_basis_coefficients(xs: Tuple[int, ...], x_star: int, p: int) -> Tuple[int, ...]:
+    """
+    计算所有拉格朗日基函数在x_star处的取值 L_i(x_star) mod p
+    
+    分子 Π_{j!=i}(x^*-x_j) 由前缀积和后缀积一次性得到，避免对每个i重复做O(n)次乘法；
+    结果只依赖 (xs, x_star, p)，重复运行时直接命中缓存
+    
+    Args:
+        xs: 各参与方的x坐标
+        x_star: 插值点
+        p: 素数模数
+        
+    Returns:
+        与xs等长的元组，第i项为 L_i(x_star) mod p
+    """
+    n = len(xs)
+    diffs, denom_diffs = _diff_tables(xs, x_star, p)
+    
+    # 默认素数远超64位，无法使用定长整数，gmpy2可用时改用GMP大整数运算
+    if gmpy2 is not None:
+        p = gmpy2.mpz(p)
+        diffs = [gmpy2.mpz(d) for d in diffs]
+        denom_diffs = [[gmpy2.mpz(d) for d in row] for row in denom_diffs]
+    
+    # 前缀积 prefix[i] = Π_{j<i}(x^*-x_j)，后缀积 suffix[i] = Π_{j>=i}(x^*-x_j)
+    prefix = [1] * (n + 1)
+    suffix = [1] * (n + 1)
+    for i in range(n):
+        prefix[i + 1] = (prefix[i] * diffs[i]) % p
+    for i in range(n - 1, -1, -1):
+        suffix[i] = (suffix[i + 1] * diffs[i]) % p
+    
+    denominators = []
+    for i in range(n):
+        denominator = 1
+        for d in denom_diffs[i]:
+            denominator = (denominator * d) % p
+        denominators.append(denominator)
+    
+    # 所有分母一次批量求逆
+    denom_invs = batch_invert(denominators, p)
+    
+    coefficients = []
+    for i in range(n):
+        numerator = (prefix[i] * suffix[i + 1]) % p
+        coefficients.append(int((numerator * denom_invs[i]) % p))
+    
+    return tuple(coefficients)
+
 async def four_party_compute(
     x_i: int, 
     x_j: int, 
@@ -32,8 +114,10 @@ async def four_party_compute(
     party_i_id: Optional[int] = None, 
     party_j_id: Optional[int] = None, 
     party_k_id: Optional[int] = None,
-    party_l_id: Optional[int] = None
-) -> Optional[Tuple[int, int, int, int, int, float]]:
+    party_l_id: Optional[int] = None,
+    network_condition: Optional[NetworkCondition] = None,
+    pool: Optional[ParticipantPool] = None
+) -> Optional[Tuple[int, int, int, int, int, int, float]]:
     """
     四方安全计算拉格朗日基函数值
     
@@ -42,9 +126,12 @@ async def four_party_compute(
         x_star: 插值点
         group: 循环群
         party_i_id, party_j_id, party_k_id, party_l_id: 参与方的实际标号
+        network_condition: 网络模拟条件，None时按环境变量选择参与方类型
+        pool: 参与方池，提供时复用其中已启动的参与方
         
     Returns:
-        (结果, 发送数据大小, 接收数据大小, 发送轮数, 接收轮数, 运行时间) 的元组，失败时返回None
+        (分子, 分母, 发送数据大小, 接收数据大小, 发送轮数, 接收轮数, 运行时间) 的元组，失败时返回None
+        基函数值为 分子/分母 mod p，由调用方批量求逆后得到
     """
     # 转换为整型
     x_i = int(x_i)
@@ -52,8 +139,8 @@ async def four_party_compute(
     x_k = int(x_k)
     x_l = int(x_l)
     
-    # 记录开始时间
-    overall_start_time = time.time()
+    # 记录开始时间(单调时钟，纳秒整数)
+    overall_start_time = time.perf_counter_ns()
     
     # 使用实际标号或默认标号
     p_i_name = f"P_{party_i_id}" if party_i_id is not None else "P_i"
@@ -61,257 +148,188 @@ async def four_party_compute(
     p_k_name = f"P_{party_k_id}" if party_k_id is not None else "P_k"
     p_l_name = f"P_{party_l_id}" if party_l_id is not None else "P_l"
     
-    logger.info(f"开始four_party_compute: {p_i_name}(x={x_i}), {p_j_name}(x={x_j}), {p_k_name}(x={x_k}), {p_l_name}(x={x_l}), x_star={x_star}")
+    logger.debug("开始four_party_compute: %s(x=%s), %s(x=%s), %s(x=%s), %s(x=%s), x_star=%s", p_i_name, x_i, p_j_name, x_j, p_k_name, x_k, p_l_name, x_l, x_star)
     
     # 初始化四个参与方，使用动态端口分配
+    port_i = port_j = port_k = port_l = None
     try:
-        port_i = await port_manager.get_port()
-        port_j = await port_manager.get_port()
-        port_k = await port_manager.get_port()
-        port_l = await port_manager.get_port()
+        if pool is not None:
+            # 从参与方池中取出已启动的参与方，复用其端口和连接
+            P_i, P_j, P_k, P_l = await pool.acquire([(p_i_name, x_i), (p_j_name, x_j), (p_k_name, x_k), (p_l_name, x_l)])
+            port_i, port_j, port_k, port_l = P_i.comm.port, P_j.comm.port, P_k.comm.port, P_l.comm.port
+        else:
+            port_i = await port_manager.get_port()
+            port_j = await port_manager.get_port()
+            port_k = await port_manager.get_port()
+            port_l = await port_manager.get_port()
         
-        P_i = create_participant(p_i_name, port_i, x_i, x_star, group.p)
-        P_j = create_participant(p_j_name, port_j, x_j, x_star, group.p)
-        P_k = create_participant(p_k_name, port_k, x_k, x_star, group.p)
-        P_l = create_participant(p_l_name, port_l, x_l, x_star, group.p)
+            P_i = create_participant(p_i_name, port_i, x_i, x_star, group.p, network_condition=network_condition)
+            P_j = create_participant(p_j_name, port_j, x_j, x_star, group.p, network_condition=network_condition)
+            P_k = create_participant(p_k_name, port_k, x_k, x_star, group.p, network_condition=network_condition)
+            P_l = create_participant(p_l_name, port_l, x_l, x_star, group.p, network_condition=network_condition)
         
-        # 并行启动所有参与方的通信服务
-        await asyncio.gather(
-            P_i.start(),
-            P_j.start(),
-            P_k.start(),
-            P_l.start()
-        )
+            # 并行启动所有参与方的通信服务
+            await asyncio.gather(
+                P_i.start(),
+                P_j.start(),
+                P_k.start(),
+                P_l.start()
+            )
     except Exception as e:
         logger.error(f"初始化参与方失败: {e}")
         # 释放端口
-        for port_var in ['port_i', 'port_j', 'port_k', 'port_l']:
-            if port_var in locals():
-                await port_manager.release_port(locals()[port_var])
+        await asyncio.gather(
+            *(port_manager.release_port(port) for port in (port_i, port_j, port_k, port_l) if port is not None),
+            return_exceptions=True
+        )
         return None
 
+    reusable = False
     try:
         #---------------------------------------------
         # 第1部分: 计算 (x_i-x_j)(x_i-x_k)(x_i-x_l)
         #  1) 四次1分享 => r_{11..}, r_{21..}, r_{31..}, r_{41..};一次0分享 => r_{1..}
         #---------------------------------------------
         # 这里我们一次性生成四行, each row=[r1, r2, r3, r4], 乘积=1
-        share_mat = [mini_one_share(group, 4) for _ in range(4)]
-        share_mat_0 = mini_zero_share(group, 4)
-        r11,r12,r13,r14 = share_mat[0]
-        r21,r22,r23,r24 = share_mat[1]
-        r31,r32,r33,r34 = share_mat[2]
-        r41,r42,r43,r44 = share_mat[3]
-        r1,r2,r3,r4 = share_mat_0
+        # gmpy2可用时以mpz进行域运算
+        p = to_field(group.p)[0]
+        
+        # 各参与方由成对共享种子非交互地生成自己的份额(PRSS)，无需集中生成和分发
+        # 1分享序号0~3为r_{1.}~r_{4.}，序号4为第2部分的[rr1..rr4]；
+        # 0分享序号0为[r1..r4]，序号1为[a1..a4]
+        session = setup_prss([P_i, P_j, P_k, P_l])
+        (r11, r21, r31, r41, rr1), (r1, a1) = prss_local_shares(P_i, [P_j, P_k, P_l], session, 5, 2)
+        (r12, r22, r32, r42, rr2), (r2, a2) = prss_local_shares(P_j, [P_i, P_k, P_l], session, 5, 2)
+        (r13, r23, r33, r43, rr3), (r3, a3) = prss_local_shares(P_k, [P_i, P_j, P_l], session, 5, 2)
+        (r14, r24, r34, r44, rr4), (r4, a4) = prss_local_shares(P_l, [P_i, P_j, P_k], session, 5, 2)
 
         # 2) 交叉发送
         #   P_i发送: r21*x_i -> P_j, r31*x_i -> P_k, r41*x_i -> P_l
-        masked_ij = (r21 * P_i.x) % group.p
-        masked_ik = (r31 * P_i.x) % group.p
-        masked_il = (r41 * P_i.x) % group.p
-        
-        #   P_j发送: r12*x_j -> P_i, r32*x_j -> P_k, r42*x_j -> P_l; r2*x_j -> P_i
-        masked_ji = (r12 * P_j.x) % group.p
-        masked_jk = (r32 * P_j.x) % group.p
-        masked_jl = (r42 * P_j.x) % group.p
-        
-        #   P_k发送: r13*x_k -> P_i, r23*x_k -> P_j, r43*x_k -> P_l; r3*x_k -> P_i
-        masked_ki = (r13 * P_k.x) % group.p
-        masked_kj = (r23 * P_k.x) % group.p
-        masked_kl = (r43 * P_k.x) % group.p
-        
-        #   P_l发送: r14*x_l -> P_i, r24*x_l -> P_j, r34*x_l -> P_k; r4*x_l -> P_i
-        masked_li = (r14 * P_l.x) % group.p
-        masked_lj = (r24 * P_l.x) % group.p
-        masked_lk = (r34 * P_l.x) % group.p
-        
-        # 并行发送所有消息
-        await asyncio.gather(
-            P_i.send_value(P_j, str(int(masked_ij))),
-            P_i.send_value(P_k, str(int(masked_ik))),
-            P_i.send_value(P_l, str(int(masked_il))),
-            P_j.send_value(P_i, str(int(masked_ji))),
-            P_j.send_value(P_k, str(int(masked_jk))),
-            P_j.send_value(P_l, str(int(masked_jl))),
-            P_k.send_value(P_i, str(int(masked_ki))),
-            P_k.send_value(P_j, str(int(masked_kj))),
-            P_k.send_value(P_l, str(int(masked_kl))),
-            P_l.send_value(P_i, str(int(masked_li))),
-            P_l.send_value(P_j, str(int(masked_lj))),
-            P_l.send_value(P_k, str(int(masked_lk)))
-        )
-
-        # P_i 等待 3 个值
-        vals_i = await P_i.recv_values(3, wait_sec=DEFAULT_RECV_TIMEOUT)
-        if len(vals_i) < 3:
-            logger.error(f"[{p_i_name}] 未收到足够掩码, 协议中断.")
-            await cleanup_resources([P_i, P_j, P_k, P_l], [port_i, port_j, port_k, port_l])
-            return None
-
-        # 3) 组合
-        chunki_j = vals_i[0]
-        chunki_k = vals_i[1]
-        chunki_l = vals_i[2]
-        x_i_sqr = (P_i.x * P_i.x) % group.p
-        x_i_cub = (P_i.x * P_i.x * P_i.x) % group.p
-        x_j_x_k_1 = (r11 * chunki_j * chunki_k * chunki_l) % group.p
-
-        masked_j = (r2 + P_j.x) % group.p
-        masked_k = (r3 + P_k.x) % group.p
-        masked_l = (r4 + P_l.x) % group.p
-        
-        # 并行发送
-        await asyncio.gather(
-            P_j.send_value(P_i, str(int(masked_j))),
-            P_k.send_value(P_i, str(int(masked_k))),
-            P_l.send_value(P_i, str(int(masked_l)))
-        )
-
-        # P_i 等待 3 个值
-        vals_i_1 = await P_i.recv_values(3, wait_sec=DEFAULT_RECV_TIMEOUT)
-        if len(vals_i_1) < 3:
-            logger.error(f"[{p_i_name}] 未收到足够掩码, 协议中断.")
-            await cleanup_resources([P_i, P_j, P_k, P_l], [port_i, port_j, port_k, port_l])
-            return None
-            
-        chunkj = vals_i_1[0]
-        chunkk = vals_i_1[1]
-        chunkl = vals_i_1[2]
-        x_j_x_k_2 = (x_i_sqr * ((r1 + chunkj + chunkk + chunkl) % group.p)) % group.p
-        A = (x_i_cub - x_j_x_k_1 - x_j_x_k_2) % group.p
-
-        # 4) 0分享 => [a1,a2,a3,a4]
-        zero_sh = mini_zero_share(group, 4)
-        a1, a2, a3, a4 = zero_sh
+        masked_ij = (r21 * P_i.x) % p
+        masked_ik = (r31 * P_i.x) % p
+        masked_il = (r41 * P_i.x) % p
         
-        # 其他参与方接收
-        vals_j = await P_j.recv_values(3, wait_sec=DEFAULT_RECV_TIMEOUT)
-        vals_k = await P_k.recv_values(3, wait_sec=DEFAULT_RECV_TIMEOUT)
-        vals_l = await P_l.recv_values(3, wait_sec=DEFAULT_RECV_TIMEOUT)
+        #   P_j发送: r12*x_j -> P_i, r32*x_j -> P_k, r42*x_j -> P_l; r2+x_j -> P_i
+        masked_ji = (r12 * P_j.x) % p
+        masked_jk = (r32 * P_j.x) % p
+        masked_jl = (r42 * P_j.x) % p
+        masked_j = (r2 + P_j.x) % p
         
-        # 检查接收数据
-        for party, vals, party_name in [(P_j, vals_j, p_j_name), 
-                                       (P_k, vals_k, p_k_name), 
-                                       (P_l, vals_l, p_l_name)]:
-            if len(vals) < 3:
-                logger.error(f"{party_name} 未收到足够掩码, 协议中断.")
-                await cleanup_resources([P_i, P_j, P_k, P_l], [port_i, port_j, port_k, port_l])
-                return None
+        #   P_k发送: r13*x_k -> P_i, r23*x_k -> P_j, r43*x_k -> P_l; r3+x_k -> P_i
+        masked_ki = (r13 * P_k.x) % p
+        masked_kj = (r23 * P_k.x) % p
+        masked_kl = (r43 * P_k.x) % p
+        masked_k = (r3 + P_k.x) % p
         
-        # P_j 计算
-        chunkj_i = vals_j[0]
-        chunkj_k = vals_j[1]
-        chunkj_l = vals_j[2]
-        xixkxl = (chunkj_i * r22 * chunkj_k * chunkj_l) % group.p
-        delta_j = (a2 + xixkxl) % group.p
-
-        # P_k 计算
-        chunkk_i = vals_k[0]
-        chunkk_j = vals_k[1]
-        chunkk_l = vals_k[2]
-        xixjxl = (chunkk_i * chunkk_j * r33 * chunkk_l) % group.p
-        delta_k = (a3 + xixjxl) % group.p
-
-        # P_l 计算
-        chunkl_i = vals_l[0]
-        chunkl_j = vals_l[1]
-        chunkl_k = vals_l[2]
-        xixjxk = (chunkl_i * chunkl_j * chunkl_k * r44) % group.p
-        delta_l = (a4 + xixjxk) % group.p
-
-        # 并行发送delta数据
-        await asyncio.gather(
-            P_j.send_value(P_i, str(int(delta_j))),
-            P_k.send_value(P_i, str(int(delta_k))),
-            P_l.send_value(P_i, str(int(delta_l)))
-        )
+        #   P_l发送: r14*x_l -> P_i, r24*x_l -> P_j, r34*x_l -> P_k; r4+x_l -> P_i
+        masked_li = (r14 * P_l.x) % p
+        masked_lj = (r24 * P_l.x) % p
+        masked_lk = (r34 * P_l.x) % p
+        masked_l = (r4 + P_l.x) % p
         
-        # P_i 等待 3个值
-        vals2_i = await P_i.recv_values(3, wait_sec=DEFAULT_RECV_TIMEOUT)
-        if len(vals2_i) < 3:
-            logger.error(f"[{p_i_name}] 未收到足够 0分享数据, 中断.")
-            await cleanup_resources([P_i, P_j, P_k, P_l], [port_i, port_j, port_k, port_l])
-            return None
-            
-        d_j = vals2_i[0]
-        d_k = vals2_i[1]
-        d_l = vals2_i[2]
-        denominator = (a1 + A + d_j + d_k + d_l) % group.p
+        # 3) 0分享 => [a1,a2,a3,a4](已由PRSS生成)
 
         #---------------------------------------------
         # 第2部分: 计算 (x^*-x_j)(x^*-x_k)(x^*-x_l) => 再1次1分享
+        # 该部分掩码只依赖本地随机数，提前计算
         #---------------------------------------------
-        share_last = mini_one_share(group, 4)
-        rr1, rr2, rr3, rr4 = share_last
-
         # P_j => P_i: rr2*(x^*-x_j)
-        masked_j_1 = (rr2*((P_j.x_star - P_j.x)%group.p))%group.p
+        masked_j_1 = (rr2 * P_j.x_star_minus_x) % p
         
         # P_k => P_i: rr3*(x^*-x_k)
-        masked_k_1 = (rr3*((P_k.x_star - P_k.x)%group.p))%group.p
+        masked_k_1 = (rr3 * P_k.x_star_minus_x) % p
         
         # P_l => P_i: rr4*(x^*-x_l)
-        masked_l_1 = (rr4*((P_l.x_star - P_l.x)%group.p))%group.p
+        masked_l_1 = (rr4 * P_l.x_star_minus_x) % p
         
-        # 并行发送
-        await asyncio.gather(
-            P_j.send_value(P_i, str(int(masked_j_1))),
-            P_k.send_value(P_i, str(int(masked_k_1))),
-            P_l.send_value(P_i, str(int(masked_l_1)))
-        )
+        # 4) 交换: P_i只作为组合方接收数据；P_j、P_k、P_l收到其余三方的掩码后立即计算delta，
+        #    将 [发往P_i的乘法掩码, 加法掩码, delta, (x^*-x)掩码] 合并为一条消息发给P_i
+        recv_i_task = asyncio.create_task(P_i.recv_values_bulk(3, wait_sec=DEFAULT_RECV_TIMEOUT))
+        
+        try:
+            sent = await asyncio.gather(
+                P_i.send_value(P_j, masked_ij),
+                P_i.send_value(P_k, masked_ik),
+                P_i.send_value(P_l, masked_il),
+                P_j.send_value(P_k, masked_jk),
+                P_j.send_value(P_l, masked_jl),
+                P_k.send_value(P_j, masked_kj),
+                P_k.send_value(P_l, masked_kl),
+                P_l.send_value(P_j, masked_lj),
+                P_l.send_value(P_k, masked_lk),
+                # P_j 算 x_i*x_k*x_l, delta_j = a2 + x_i*x_k*x_l
+                send_to_combiner(P_j, P_i, 3, r22, a2, 1, [masked_ji, masked_j], masked_j_1, p),
+                # P_k 算 x_i*x_j*x_l, delta_k = a3 + x_i*x_j*x_l
+                send_to_combiner(P_k, P_i, 3, r33, a3, 1, [masked_ki, masked_k], masked_k_1, p),
+                # P_l 算 x_i*x_j*x_k, delta_l = a4 + x_i*x_j*x_k
+                send_to_combiner(P_l, P_i, 3, r44, a4, 1, [masked_li, masked_l], masked_l_1, p)
+            )
+            if not all(sent[-3:]):
+                return None
 
-        # P_i 接收3个
-        vals3_i = await P_i.recv_values(3, wait_sec=DEFAULT_RECV_TIMEOUT)
-        if len(vals3_i) < 3:
-            logger.error(f"[{p_i_name}] 未收到足够 (x^*-x_j)(x^*-x_k)(x^*-x_l) 数据, 中断.")
-            await cleanup_resources([P_i, P_j, P_k, P_l], [port_i, port_j, port_k, port_l])
+            # P_i 等待 3 条消息，每条为 [乘法掩码, 加法掩码, delta, (x^*-x)掩码]
+            msgs_i = await recv_i_task
+        finally:
+            # gather出错或提前返回时取消仍在等待的接收任务，不留下孤立任务
+            if not recv_i_task.done():
+                recv_i_task.cancel()
+        
+        if len(msgs_i) < 3 or any(len(m) != 4 for m in msgs_i):
+            logger.error(f"[{p_i_name}] 未收到足够掩码、0分享及(x^*-x_j)(x^*-x_k)(x^*-x_l) 数据, 中断.")
             return None
-            
-        vj_ = vals3_i[0]
-        vk_ = vals3_i[1]
-        vl_ = vals3_i[2]
-        numerator = (rr1 * vj_ * vk_ * vl_) % group.p
 
-        # 最终除法
-        denom_inv = group.mod_inverse(denominator)
-        final_res = (numerator * denom_inv) % group.p
+        # 5) 组合
+        (chunki_j, chunkj, d_j, vj_), (chunki_k, chunkk, d_k, vk_), (chunki_l, chunkl, d_l, vl_) = (
+            to_field(*m) for m in msgs_i
+        )
+        x_i_sqr = P_i.xpow(2, p)
+        x_i_cub = P_i.xpow(3, p)  # 复用已缓存的x_i^2，仅需一次模乘
+        x_j_x_k_1 = group.mulmod(r11, chunki_j, chunki_k, chunki_l)
+        x_j_x_k_2 = (x_i_sqr * ((r1 + chunkj + chunkk + chunkl) % p)) % p
+        A = (x_i_cub - x_j_x_k_1 - x_j_x_k_2) % p
+
+        denominator = (a1 + A + d_j + d_k + d_l) % p
+        numerator = group.mulmod(rr1, vj_, vk_, vl_)
+
+        # 除法推迟到所有任务完成后由调用方对分母批量求逆
+        if denominator == 0:
+            raise ZeroDivisionError("分母为0，无法求逆")
+        numerator, denominator = int(numerator), int(denominator)
+
+        # 记录结束时间
+        overall_end_time = time.perf_counter_ns()
+        run_time = (overall_end_time - overall_start_time) / 1e9
+
+        # 四方总的通信量
+        send_data_size = P_i.comm.send_data_size + P_j.comm.send_data_size + P_k.comm.send_data_size + P_l.comm.send_data_size
+        recv_data_size = P_i.comm.recv_data_size + P_j.comm.recv_data_size + P_k.comm.recv_data_size + P_l.comm.recv_data_size
+        # 四方总通信轮次
+        send_rounds = P_i.comm.send_rounds + P_j.comm.send_rounds + P_k.comm.send_rounds + P_l.comm.send_rounds
+        recv_rounds = P_i.comm.recv_rounds + P_j.comm.recv_rounds + P_k.comm.recv_rounds + P_l.comm.recv_rounds
+    
+        reusable = True
 
     except Exception as e:
         logger.error(f"四方计算过程出错: {e}")
-        await cleanup_resources([P_i, P_j, P_k, P_l], [port_i, port_j, port_k, port_l])
         return None
-    
-    # 关闭通信并释放资源
-    try:
-        await cleanup_resources([P_i, P_j, P_k, P_l], [port_i, port_j, port_k, port_l])
-    except Exception:
-        # 忽略资源释放错误
-        pass
-
-    # 记录结束时间
-    overall_end_time = time.time()
-    run_time = overall_end_time - overall_start_time
+    finally:
+        # 统计完成后统一释放资源：成功时将参与方归还池中，失败时丢弃
+        try:
+            await release_resources([P_i, P_j, P_k, P_l], [port_i, port_j, port_k, port_l], pool, reusable=reusable)
+        except Exception as e:
+            # 忽略资源释放错误，不影响结果返回
+            logger.error(f"资源清理过程出错: {e}")
 
-    # 四方总的通信量
-    send_data_size = P_i.comm.send_data_size + P_j.comm.send_data_size + P_k.comm.send_data_size + P_l.comm.send_data_size
-    recv_data_size = P_i.comm.recv_data_size + P_j.comm.recv_data_size + P_k.comm.recv_data_size + P_l.comm.recv_data_size
-    # 四方总通信轮次
-    send_rounds = P_i.comm.send_rounds + P_j.comm.send_rounds + P_k.comm.send_rounds + P_l.comm.send_rounds
-    recv_rounds = P_i.comm.recv_rounds + P_j.comm.recv_rounds + P_k.comm.recv_rounds + P_l.comm.recv_rounds
-    
-    # 如果使用了网络模拟，将数据写入环境变量供测试脚本使用
-    if hasattr(P_i, 'network_condition'):
-        os.environ['TOTAL_SEND_BYTES'] = str(send_data_size)
-        os.environ['TOTAL_RECV_BYTES'] = str(recv_data_size)
-
-    return final_res, send_data_size, recv_data_size, send_rounds, recv_rounds, run_time
+    return numerator, denominator, send_data_size, recv_data_size, send_rounds, recv_rounds, run_time
 
 async def secure_lagrange_interpolation(
     points: List[Tuple[int, int]], 
     x_star: int,
     p: int = DEFAULT_PRIME,
-    g: int = DEFAULT_GENERATOR
-) -> int:
+    g: int = DEFAULT_GENERATOR,
+    network_condition: Optional[NetworkCondition] = None,
+    return_stats: bool = False
+) -> Union[int, Tuple[int, Dict[str, Any]]]:
     """
     安全拉格朗日插值函数，支持多方安全计算
     
@@ -320,12 +338,15 @@ async def secure_lagrange_interpolation(
         x_star: 要插值的x坐标
         p: 素数模数
         g: 生成元
+        network_condition: 网络模拟条件，None时按环境变量选择参与方类型
+        return_stats: 是否同时返回通信统计
     
     Returns:
-        y_star: x_star处的插值结果
+        y_star: x_star处的插值结果；return_stats为True时返回 (y_star, 统计字典)，
+        统计字典包含 send_bytes, recv_bytes, run_time, compute_time
     """
     # 记录整个协议的开始时间
-    overall_start_time = time.time()
+    overall_start_time = time.perf_counter_ns()
 
     # 总的数据通信量
     overall_send_data_size = 0
@@ -370,7 +391,16 @@ async def secure_lagrange_interpolation(
     logger.info("开始计算拉格朗日基函数...")
     
     try:
-        from protocol import three_party_compute  # 避免循环引用
+        # 参与方池在所有任务间复用已启动的参与方，信号量限制同时执行的任务数
+        pool = ParticipantPool(x_star, group.p, network_condition=network_condition)
+        sem = asyncio.Semaphore((os.cpu_count() or 1) * 4)
+        
+        # 每个真实参与方预先并行启动一个实例，各三元组/四元组任务优先复用
+        await pool.warm_up([(f"P_{i}", x[i]) for i in range(1, party_num+1)])
+        
+        async def bounded(task):
+            async with sem:
+                return await task
         
         # 对每个参与方创建一个用于存储任务和结果的结构
         computation_tasks = []
@@ -384,13 +414,14 @@ async def secure_lagrange_interpolation(
             for i in range(1, party_num+1):
                 for triple in result:
                     if triple[0] == i:
-                        logger.info(f"创建三元组并行任务 {triple}")
+                        logger.debug("创建三元组并行任务 %s", triple)
                         # 创建并行计算任务
                         task = three_party_compute(
                             x[triple[0]], x[triple[1]], x[triple[2]], x_star, group,
-                            party_i_id=triple[0], party_j_id=triple[1], party_k_id=triple[2]
+                            party_i_id=triple[0], party_j_id=triple[1], party_k_id=triple[2],
+                            network_condition=network_condition, pool=pool
                         )
-                        computation_tasks.append(task)
+                        computation_tasks.append(bounded(task))
                         # 记录任务到参与方和三元组的映射
                         task_mapping[len(computation_tasks) - 1] = (i, triple)
         else:  # 偶数情况，有三元组和四元组
@@ -398,50 +429,70 @@ async def secure_lagrange_interpolation(
             for i in range(1, party_num+1):
                 for triple in result:
                     if (triple[0] == i) and (len(triple) == 3):  # 三元组
-                        logger.info(f"创建三元组并行任务 {triple}")
+                        logger.debug("创建三元组并行任务 %s", triple)
                         task = three_party_compute(
                             x[triple[0]], x[triple[1]], x[triple[2]], x_star, group,
-                            party_i_id=triple[0], party_j_id=triple[1], party_k_id=triple[2]
+                            party_i_id=triple[0], party_j_id=triple[1], party_k_id=triple[2],
+                            network_condition=network_condition, pool=pool
                         )
-                        computation_tasks.append(task)
+                        computation_tasks.append(bounded(task))
                         task_mapping[len(computation_tasks) - 1] = (i, triple)
                     elif (triple[0] == i) and (len(triple) == 4):  # 四元组
-                        logger.info(f"创建四元组并行任务 {triple}")
+                        logger.debug("创建四元组并行任务 %s", triple)
                         task = four_party_compute(
                             x[triple[0]], x[triple[1]], x[triple[2]], x[triple[3]], x_star, group,
-                            party_i_id=triple[0], party_j_id=triple[1], party_k_id=triple[2], party_l_id=triple[3]
+                            party_i_id=triple[0], party_j_id=triple[1], party_k_id=triple[2], party_l_id=triple[3],
+                            network_condition=network_condition, pool=pool
                         )
-                        computation_tasks.append(task)
+                        computation_tasks.append(bounded(task))
                         task_mapping[len(computation_tasks) - 1] = (i, triple)
         
-        # 使用asyncio.gather并行执行所有计算任务
-        logger.info(f"开始执行 {len(computation_tasks)} 个并行计算任务")
-        task_results = await asyncio.gather(*computation_tasks, return_exceptions=True)
-        logger.info("并行计算完成，收集结果")
+        async def indexed(idx, task):
+            # 带上任务序号，完成顺序与创建顺序不同时仍能对应到参与方
+            try:
+                return idx, await task
+            except Exception as e:
+                return idx, e
         
-        # 处理计算结果
+        # 并行执行所有计算任务，按完成顺序逐个累积结果，无需等待最慢的任务后再统一处理
         success_count = 0
-        for i, result_data in enumerate(task_results):
-            if isinstance(result_data, Exception):
-                # 记录失败
-                party_i, triple = task_mapping[i]
-                logger.error(f"任务 {i} 失败: 参与方 {party_i}, 元组 {triple}, 错误: {result_data}")
-                continue
+        # 各任务返回的分子及待求逆的分母
+        numerators = []
+        denominators = []
+        try:
+            logger.info(f"开始执行 {len(computation_tasks)} 个并行计算任务")
+            pending = [indexed(idx, task) for idx, task in enumerate(computation_tasks)]
+            for fut in asyncio.as_completed(pending):
+                idx, result_data = await fut
+                if isinstance(result_data, Exception):
+                    # 记录失败
+                    party_i, triple = task_mapping[idx]
+                    logger.error(f"任务 {idx} 失败: 参与方 {party_i}, 元组 {triple}, 错误: {result_data}")
+                    continue
                 
-            if result_data:  # 非None结果表示成功
-                success_count += 1
-                party_i, _ = task_mapping[i]
-                temp_val, send_data_temp, recv_data_temp, send_rounds_temp, recv_rounds_temp, run_time_val = result_data
-                temp[party_i-1] = temp_val
-                overall_send_data_size += send_data_temp
-                overall_recv_data_size += recv_data_temp
-                overall_send_round += send_rounds_temp
-                overall_recv_round += recv_rounds_temp
-                final_value[party_i-1] = (final_value[party_i-1] * temp_val) % group.p
-                run_time_temp[party_i-1] = max(run_time_temp[party_i-1], run_time_val)
+                if result_data:  # 非None结果表示成功
+                    success_count += 1
+                    party_i, _ = task_mapping[idx]
+                    numerator, denominator, send_data_temp, recv_data_temp, send_rounds_temp, recv_rounds_temp, run_time_val = result_data
+                    numerators.append((party_i, numerator))
+                    denominators.append(denominator)
+                    overall_send_data_size += send_data_temp
+                    overall_recv_data_size += recv_data_temp
+                    overall_send_round += send_rounds_temp
+                    overall_recv_round += recv_rounds_temp
+                    run_time_temp[party_i-1] = max(run_time_temp[party_i-1], run_time_val)
+        finally:
+            # 所有任务完成后统一关闭参与方并释放端口
+            await pool.close()
         
         logger.info(f"成功完成 {success_count}/{len(computation_tasks)} 个计算任务")
         
+        # 对所有任务的分母只做一次批量求逆，再乘回各自的分子
+        for (party_i, numerator), denom_inv in zip(numerators, batch_invert(denominators, group.p)):
+            temp_val = (numerator * denom_inv) % group.p
+            temp[party_i-1] = temp_val
+            final_value[party_i-1] = (final_value[party_i-1] * temp_val) % group.p
+        
         # 应用最终乘法
         for i in range(1, party_num+1):
             final_value[i-1] = (final_value[i-1] * y[i]) % group.p
@@ -455,8 +506,8 @@ async def secure_lagrange_interpolation(
         max_compute_time = max(run_time_temp) if run_time_temp else 0
         
         # 计算整个协议的运行时间
-        overall_end_time = time.time()
-        run_time = overall_end_time - overall_start_time
+        overall_end_time = time.perf_counter_ns()
+        run_time = (overall_end_time - overall_start_time) / 1e9
 
         logger.info("\n=== 插值结果 ===")
         logger.info(f"参与方数量：{party_num}")
@@ -468,13 +519,13 @@ async def secure_lagrange_interpolation(
         logger.info(f"协议通信量：send={overall_send_data_size} 字节, recv={overall_recv_data_size} 字节")
         logger.info(f"协议通信轮次: Overall_Round = {overall_round}, all_send_rounds = {overall_send_round}，all_recv_rounds = {overall_recv_round}\n")
 
-        # 如果使用了网络模拟，将总结果写入环境变量
-        if 'USE_NETWORK_SIMULATION' in os.environ and os.environ['USE_NETWORK_SIMULATION'].lower() == 'true':
-            os.environ['TOTAL_SEND_BYTES'] = str(overall_send_data_size)
-            os.environ['TOTAL_RECV_BYTES'] = str(overall_recv_data_size)
-            os.environ['TOTAL_RUN_TIME'] = str(run_time)
-            os.environ['MAX_COMPUTE_TIME'] = str(max_compute_time)
-
+        if return_stats:
+            return y_star, {
+                "send_bytes": overall_send_data_size,
+                "recv_bytes": overall_recv_data_size,
+                "run_time": run_time,
+                "compute_time": max_compute_time
+            }
         return y_star
         
     except Exception as e:
@@ -482,24 +533,20 @@ async def secure_lagrange_interpolation(
         # 如果安全计算失败，回退到普通计算
         logger.warning("回退到普通计算...")
         # 实现简单的拉格朗日插值作为备用
+        try:
+            basis = lagrange_basis_coefficients(tuple(x[1:]), x_star, p)
+        except Exception as e:
+            logger.error(f"计算拉格朗日基时出错: {e}")
+            raise
         y_star = 0
-        for i in range(1, party_num+1):
-            xi, yi = x[i], y[i]
-            # 计算拉格朗日基多项式
-            l_i = 1
-            for j in range(1, party_num+1):
-                if i != j:
-                    xj = x[j]
-                    # 使用模运算进行除法（乘以模逆元）
-                    numerator = (x_star - xj) % p
-                    denominator = (xi - xj) % p
-                    try:
-                        inv_denominator = group.mod_inverse(denominator)
-                        l_i = (l_i * numerator * inv_denominator) % p
-                    except Exception as e:
-                        logger.error(f"计算拉格朗日基时出错: {e}")
-                        raise
-            # 累加结果
+        for yi, l_i in zip(y[1:], basis):
             y_star = (y_star + yi * l_i) % p
         logger.info(f"普通计算结果: y={y_star}(mod {p})")
+        if return_stats:
+            return y_star, {
+                "send_bytes": 0,
+                "recv_bytes": 0,
+                "run_time": (time.perf_counter_ns() - overall_start_time) / 1e9,
+                "compute_time": 0.0
+            }
         return y_star
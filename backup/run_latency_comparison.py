@@ -3,37 +3,49 @@
 """
 
 import asyncio
+import functools
 import logging
 import os
 import matplotlib
+matplotlib.use("Agg")  # 只保存图片文件，使用非交互式Agg后端
 import matplotlib.pyplot as plt
+from matplotlib import font_manager
 import platform
+from typing import Optional
 from latency_comparison import main as run_latency_tests
+from utils import install_fast_loop
+
+# Windows下依次尝试的中文字体
+CHINESE_FONTS = ['SimHei', 'Microsoft YaHei', 'SimSun', 'FangSong']
+
+@functools.lru_cache(maxsize=None)
+def _chinese_font() -> Optional[str]:
+    """
+    返回第一个能实际解析到字体文件的中文字体名称，没有时返回None
+    设置rcParams本身不会失败，必须通过findfont确认字体存在；结果缓存，字体只扫描一次
+    """
+    for font_name in CHINESE_FONTS:
+        try:
+            font_manager.findfont(font_manager.FontProperties(family=font_name), fallback_to_default=False)
+            return font_name
+        except ValueError:
+            continue
+    return None
 
 def setup_matplotlib_font():
     """设置matplotlib字体以正确显示中文"""
     if platform.system() == 'Windows':
-        # 尝试使用多种Windows中文字体
-        chinese_fonts = ['SimHei', 'Microsoft YaHei', 'SimSun', 'FangSong']
-        font_found = False
-        
-        for font_name in chinese_fonts:
-            try:
-                plt.rcParams['font.sans-serif'] = [font_name]
-                plt.rcParams['axes.unicode_minus'] = False
-                font_found = True
-                print(f"使用中文字体: {font_name}")
-                break
-            except Exception as e:
-                print(f"尝试字体 {font_name} 失败: {e}")
-                continue
-                
-        if not font_found:
+        font_name = _chinese_font()
+        if font_name is not None:
+            plt.rcParams['font.sans-serif'] = [font_name]
+            plt.rcParams['axes.unicode_minus'] = False
+            print(f"使用中文字体: {font_name}")
+        else:
             try:
                 # 尝试使用微软雅黑字体文件
                 font_path = 'C:/Windows/Fonts/msyh.ttc'  # 微软雅黑字体路径
                 if os.path.exists(font_path):
-                    font_properties = matplotlib.font_manager.FontProperties(fname=font_path)
+                    font_properties = font_manager.FontProperties(fname=font_path)
                     plt.rcParams['font.family'] = font_properties.get_name()
                     print("使用字体文件: msyh.ttc")
                 else:
@@ -57,7 +69,7 @@ async def main():
     latency_results_dir = os.path.join(results_dir, "latency_experiment")
     original_results_dir = os.path.join(results_dir, "original_experiment")
     
-    os.makedirs(results_dir, exist_ok=True)
+    # 只需创建两个子目录，上级目录随之创建
     os.makedirs(latency_results_dir, exist_ok=True)
     os.makedirs(original_results_dir, exist_ok=True)
     
@@ -72,4 +84,6 @@ async def main():
     print("="*50)
 
 if __name__ == "__main__":
+    # 使用uvloop加速（如果可用）
+    install_fast_loop()
     asyncio.run(main())
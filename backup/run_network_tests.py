@@ -10,7 +10,7 @@ import sys
 from typing import List, Dict, Any
 
 from network_test import run_all_tests, plot_results
-from utils import setup_logging
+from utils import setup_logging, install_fast_loop
 from network_simulator import NETWORK_CONDITIONS
 
 async def main():
@@ -71,4 +71,6 @@ async def main():
         return 1
 
 if __name__ == "__main__":
+    # 使用uvloop加速（如果可用）
+    install_fast_loop()
     sys.exit(asyncio.run(main()))
@@ -8,15 +8,20 @@ import argparse
 import os
 import time
 import sys
-import json
 from pathlib import Path
+from dataclasses import dataclass
 from typing import List, Dict, Any, Tuple, Optional
 import concurrent.futures
-from contextlib import suppress
+
+# tqdm为可选依赖，未安装时不显示进度条
+try:
+    from tqdm.asyncio import tqdm
+except ImportError:
+    tqdm = None
 
 # 导入必要的模块
-from network_test import TEST_NETWORK_TYPES, TEST_PARTY_COUNTS, RESULTS_DIR
-from utils import setup_logging
+from network_test import TEST_NETWORK_TYPES, TEST_PARTY_COUNTS, RESULTS_DIR, run_network_test
+from utils import setup_logging, install_fast_loop, dumps_pretty
 from network_simulator import NETWORK_CONDITIONS
 from config import MAX_PARTIES, MIN_PARTIES
 
@@ -30,10 +35,25 @@ DEFAULT_OUTPUT = "network_test_results_optimized.json"
 # 设置性能优化选项
 OPTIMIZE_FOR_SPEED = True  # 启用速度优化
 ENABLE_COMPRESSION = True  # 启用数据压缩
-PARALLEL_EXECUTION = True  # 启用并行执行
+PARALLEL_EXECUTION = False  # 默认串行执行，并行时各测试互相争抢CPU并共用端口范围，计时不可靠
 MAX_PARALLEL_TASKS = 2    # 最大并行任务数
 
-async def run_single_test(party_count: int, network_type: str, timeout: int = DEFAULT_TIMEOUT) -> Dict[str, Any]:
+# 各网络类型的条件描述字符串，导入时生成一次
+_NETWORK_COND_STR = {name: str(condition) for name, condition in NETWORK_CONDITIONS.items()}
+
+@dataclass(slots=True)
+class TestResult:
+    """单次测试的结果，在run_single_test、run_tests_batch和process_results之间传递"""
+    party_count: int
+    network_type: str
+    success: bool
+    error: Optional[str] = None
+    run_time: float = 0.0
+    actual_run_time: float = 0.0
+    send_data_size: float = 0.0
+    recv_data_size: float = 0.0
+
+async def run_single_test(party_count: int, network_type: str, timeout: int = DEFAULT_TIMEOUT) -> TestResult:
     """
     运行单个网络测试
     
@@ -45,22 +65,12 @@ async def run_single_test(party_count: int, network_type: str, timeout: int = DE
     Returns:
         测试结果
     """
-    # 设置环境变量
-    os.environ['USE_NETWORK_SIMULATION'] = 'true'
-    os.environ['NETWORK_TYPE'] = network_type
-    
-    # 如果启用了性能优化，设置相应环境变量
-    if OPTIMIZE_FOR_SPEED:
-        os.environ['OPTIMIZE_FOR_SPEED'] = 'true'
-    if ENABLE_COMPRESSION:
-        os.environ['ENABLE_COMPRESSION'] = 'true'
+    # 网络类型作为参数传给run_network_test，由其直接构造网络条件，
+    # 不再写入进程共享的环境变量，并发运行的测试互不干扰
     
     # 记录开始时间
     start_time = time.time()
     
-    # 导入测试模块（动态导入避免循环引用）
-    from network_test import run_network_test
-    
     try:
         # 使用超时运行测试
         result = await asyncio.wait_for(
@@ -69,34 +79,30 @@ async def run_single_test(party_count: int, network_type: str, timeout: int = DE
         )
         # 如果成功，记录运行时间
         run_time = time.time() - start_time
-        result['actual_run_time'] = run_time
-        result['success'] = True
-        return result
+        avg_run_time = result.get('avg_run_time')
+        return TestResult(
+            party_count=party_count,
+            network_type=network_type,
+            success=True,
+            run_time=avg_run_time if avg_run_time is not None else run_time,
+            actual_run_time=run_time,
+            send_data_size=result.get('avg_send_data_size', 0),
+            recv_data_size=result.get('avg_recv_data_size', 0)
+        )
     except asyncio.TimeoutError:
         # 测试超时
         print(f"测试超时: 参与方数量={party_count}, 网络类型={network_type}")
-        return {
-            'party_count': party_count,
-            'network_type': network_type,
-            'success': False,
-            'error': 'timeout',
-            'actual_run_time': timeout
-        }
+        return TestResult(party_count, network_type, False, error='timeout', actual_run_time=timeout)
     except Exception as e:
         # 其他错误
         print(f"测试失败: 参与方数量={party_count}, 网络类型={network_type}, 错误: {e}")
-        return {
-            'party_count': party_count, 
-            'network_type': network_type,
-            'success': False,
-            'error': str(e),
-            'actual_run_time': time.time() - start_time
-        }
+        return TestResult(party_count, network_type, False, error=str(e),
+                          actual_run_time=time.time() - start_time)
 
 async def run_tests_batch(
     test_configs: List[Tuple[int, str]], 
     repeats: int
-) -> List[Dict[str, Any]]:
+) -> List[TestResult]:
     """
     批量运行测试配置
     
@@ -121,46 +127,40 @@ async def run_tests_batch(
     
     # 根据是否启用并行执行选择不同策略
     if PARALLEL_EXECUTION:
-        # 创建并行任务组
-        task_groups = []
-        current_group = []
-        
-        for task in all_tasks:
-            current_group.append(task)
-            if len(current_group) >= MAX_PARALLEL_TASKS:
-                task_groups.append(current_group)
-                current_group = []
-        
-        if current_group:  # 添加剩余任务
-            task_groups.append(current_group)
+        # 所有任务同时提交，由信号量限制同时运行的数量，
+        # 一个任务完成后立即启动下一个，不必等待整组中最慢的任务
+        sem = asyncio.Semaphore(MAX_PARALLEL_TASKS)
         
-        # 按组执行任务
-        for group_idx, group in enumerate(task_groups):
-            print(f"执行任务组 {group_idx+1}/{len(task_groups)} - {len(group)}个任务")
-            tasks = []
-            
-            for party_count, network_type, repeat_num in group:
-                print(f"  启动测试: 参与方数量={party_count}, 网络类型={network_type}, 重复次数={repeat_num}/{repeats}")
-                task = asyncio.create_task(run_single_test(party_count, network_type))
-                tasks.append((party_count, network_type, repeat_num, task))
-            
-            # 等待所有任务完成
-            for party_count, network_type, repeat_num, task in tasks:
+        async def run_one(party_count: int, network_type: str, repeat_num: int) -> TestResult:
+            async with sem:
                 try:
-                    result = await task
-                    results.append(result)
-                    completed += 1
-                    print(f"  完成测试: 参与方数量={party_count}, 网络类型={network_type}, "
-                          f"重复次数={repeat_num}/{repeats} ({completed}/{total_tests})")
+                    return await run_single_test(party_count, network_type)
                 except Exception as e:
                     print(f"  测试失败: 参与方数量={party_count}, 网络类型={network_type}, 错误: {e}")
-                    results.append({
-                        'party_count': party_count,
-                        'network_type': network_type,
-                        'success': False,
-                        'error': str(e)
-                    })
-                    completed += 1
+                    return TestResult(party_count, network_type, False, error=str(e))
+        
+        print(f"并行执行 {total_tests} 个测试，最多同时运行 {MAX_PARALLEL_TASKS} 个")
+        
+        async def collect(tasks: List[asyncio.Task]) -> None:
+            # 每个测试完成时只更新一次进度条，结果汇总与完成顺序无关
+            if tqdm is not None:
+                pending = tqdm.as_completed(tasks, total=total_tests, desc="网络测试")
+            else:
+                pending = asyncio.as_completed(tasks)
+            for fut in pending:
+                results.append(await fut)
+        
+        if hasattr(asyncio, 'TaskGroup'):
+            # TaskGroup(Python 3.11+)在中断或出错时取消所有未完成的测试，不留下孤立任务
+            async with asyncio.TaskGroup() as tg:
+                await collect([tg.create_task(run_one(*task)) for task in all_tasks])
+        else:
+            tasks = [asyncio.ensure_future(run_one(*task)) for task in all_tasks]
+            try:
+                await collect(tasks)
+            finally:
+                for task in tasks:
+                    task.cancel()
     else:
         # 顺序执行所有任务
         for party_count, network_type, repeat_num in all_tasks:
@@ -172,9 +172,30 @@ async def run_tests_batch(
     
     return results
 
-async def process_results(raw_results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+@dataclass(slots=True)
+class RunningStats:
+    """单个指标的流式统计量，逐个结果更新，无需先收集成列表"""
+    n: int = 0
+    sum: float = 0.0
+    min: float = float('inf')
+    max: float = float('-inf')
+    
+    def update(self, x: float) -> None:
+        self.n += 1
+        self.sum += x
+        if x < self.min:
+            self.min = x
+        if x > self.max:
+            self.max = x
+    
+    @property
+    def avg(self) -> float:
+        return self.sum / self.n if self.n else 0.0
+
+async def process_results(raw_results: List[TestResult]) -> List[Dict[str, Any]]:
     """
     处理原始测试结果，按配置聚合并计算统计数据
+    单次遍历原始结果，按(参与方数量, 网络类型)流式累积各指标
     
     Args:
         raw_results: 原始测试结果列表
@@ -182,59 +203,46 @@ async def process_results(raw_results: List[Dict[str, Any]]) -> List[Dict[str, A
     Returns:
         聚合后的结果列表
     """
-    # 按配置分组结果
-    grouped_results = {}
+    # 全部失败(或没有结果)时直接返回，无需聚合
+    if not any(result.success for result in raw_results):
+        return []
+    
+    # (参与方数量, 网络类型) -> 尝试次数及各指标的流式统计
+    attempts: Dict[Tuple[int, str], int] = {}
+    stats: Dict[Tuple[int, str], Dict[str, RunningStats]] = {}
     
     for result in raw_results:
-        if not result.get('success', False):
+        key = (result.party_count, result.network_type)
+        attempts[key] = attempts.get(key, 0) + 1
+        if not result.success:
             continue
-            
-        party_count = result['party_count']
-        network_type = result['network_type']
-        key = f"{party_count}_{network_type}"
         
-        if key not in grouped_results:
-            grouped_results[key] = {
-                'party_count': party_count,
-                'network_type': network_type,
-                'network_condition': str(NETWORK_CONDITIONS[network_type]),
-                'results': []
+        metrics = stats.get(key)
+        if metrics is None:
+            metrics = stats[key] = {
+                'run_time': RunningStats(),
+                'send_data_size': RunningStats(),
+                'recv_data_size': RunningStats()
             }
-        
-        grouped_results[key]['results'].append(result)
+        metrics['run_time'].update(result.run_time)
+        metrics['send_data_size'].update(result.send_data_size)
+        metrics['recv_data_size'].update(result.recv_data_size)
     
-    # 计算聚合统计
+    # 计算聚合统计，没有成功结果的配置不输出
     aggregated_results = []
-    for group_data in grouped_results.values():
-        results = group_data['results']
-        
-        if not results:
-            continue
-            
-        successful_results = [r for r in results if r.get('success', False)]
-        success_rate = len(successful_results) / len(results) if results else 0
-        
-        if not successful_results:
-            continue
-            
-        # 计算统计信息
-        run_times = [r.get('run_time', r.get('actual_run_time', 0)) for r in successful_results]
-        send_data_sizes = [r.get('send_data_size', 0) for r in successful_results]
-        recv_data_sizes = [r.get('recv_data_size', 0) for r in successful_results]
-        
-        aggregated_result = {
-            'party_count': group_data['party_count'],
-            'network_type': group_data['network_type'],
-            'network_condition': group_data['network_condition'],
-            'avg_run_time': sum(run_times) / len(run_times),
-            'min_run_time': min(run_times),
-            'max_run_time': max(run_times),
-            'success_rate': success_rate,
-            'avg_send_data_size': sum(send_data_sizes) / len(send_data_sizes),
-            'avg_recv_data_size': sum(recv_data_sizes) / len(recv_data_sizes)
-        }
-        
-        aggregated_results.append(aggregated_result)
+    for (party_count, network_type), metrics in stats.items():
+        run_time = metrics['run_time']
+        aggregated_results.append({
+            'party_count': party_count,
+            'network_type': network_type,
+            'network_condition': _NETWORK_COND_STR[network_type],
+            'avg_run_time': run_time.avg,
+            'min_run_time': run_time.min,
+            'max_run_time': run_time.max,
+            'success_rate': run_time.n / attempts[(party_count, network_type)],
+            'avg_send_data_size': metrics['send_data_size'].avg,
+            'avg_recv_data_size': metrics['recv_data_size'].avg
+        })
     
     # 按参与方数量和网络类型排序
     return sorted(aggregated_results, key=lambda r: (r['party_count'], r['network_type']))
@@ -256,7 +264,7 @@ async def main():
     parser.add_argument("--timeout", type=int, default=DEFAULT_TIMEOUT,
                         help="每个测试的超时时间（秒）")
     parser.add_argument("--parallel", action="store_true", default=PARALLEL_EXECUTION,
-                        help="启用并行执行")
+                        help="启用并行执行(各测试的计时会相互干扰，仅用于快速冒烟测试)")
     parser.add_argument("--max-parallel", type=int, default=MAX_PARALLEL_TASKS,
                         help="最大并行任务数")
     parser.add_argument("--optimize-speed", action="store_true", default=OPTIMIZE_FOR_SPEED,
@@ -322,8 +330,8 @@ async def main():
         
         # 保存结果
         output_path = os.path.join(RESULTS_DIR, args.output)
-        with open(output_path, 'w') as f:
-            json.dump(results, f, indent=2)
+        # 整体序列化后一次写入
+        Path(output_path).write_bytes(dumps_pretty(results))
         
         # 绘制结果图表
         print("正在生成结果图表...")
@@ -353,8 +361,6 @@ async def main():
 
 if __name__ == "__main__":
     # 使用uvloop加速（如果可用）
-    with suppress(ImportError):
-        import uvloop
-        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    install_fast_loop()
     
     sys.exit(asyncio.run(main()))
@@ -4,12 +4,21 @@
 """
 
 import asyncio
+import collections
 import logging
 import socket
 import ssl
 import os
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple, Union
 import random
+import struct
+import time
+
+# gmpy2为可选依赖，协议层的域元素可能为mpz
+try:
+    import gmpy2
+except ImportError:
+    gmpy2 = None
 
 # 不在这里配置日志，使用主程序的日志配置
 
@@ -24,6 +33,34 @@ def get_cert_paths():
     key_path = os.path.join(cert_dir, "server.key")
     return cert_path, key_path
 
+# 消息帧头: (每个值的字节宽度, 负载长度)
+# 宽度为0表示负载为UTF-8文本；大于0表示负载由定宽大端序无符号整数拼接而成
+FRAME_HEADER = struct.Struct('>HI')
+
+# 宽度取该值时，负载为变长有符号整数序列，每个值为长度前缀加大端序补码，
+# 用于负数或超出定宽的整数，避免回退为十进制文本
+VARIABLE_WIDTH = 0xFFFF
+VALUE_LENGTH = struct.Struct('>I')
+
+# 可按定宽整数编码的类型
+INTEGER_TYPES = (int,) if gmpy2 is None else (int, type(gmpy2.mpz(0)))
+
+def set_nodelay(writer: asyncio.StreamWriter) -> None:
+    """
+    关闭连接上的Nagle算法，协议消息都很小，不应等待合并
+    asyncio默认事件循环已对TCP连接设置，这里显式设置以覆盖其他事件循环实现
+    """
+    sock = writer.get_extra_info('socket')
+    if sock is not None and sock.family in (socket.AF_INET, socket.AF_INET6):
+        try:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        except OSError:
+            pass
+
+def field_bytes(q: int) -> int:
+    """返回表示模q下元素所需的字节数"""
+    return (q.bit_length() + 7) // 8
+
 class AsyncSocketCommunication:
     def __init__(self, name: str, port: int = 0, host: str = '127.0.0.1', max_bandwidth: Optional[int] = None, use_tls: bool = None):
         """
@@ -42,6 +79,9 @@ class AsyncSocketCommunication:
         self.port = port
         self.host = host
         self.max_bandwidth = max_bandwidth
+        # 带宽限制使用令牌桶，桶容量为1秒的发送量
+        self._tokens = float(max_bandwidth or 0)
+        self._last_refill = time.monotonic()
         
         # TLS配置
         if use_tls is None:
@@ -55,8 +95,9 @@ class AsyncSocketCommunication:
         if self.use_tls:
             self._setup_ssl_contexts()
         
-        # 接收数据存储
-        self.received_data: List[str] = []
+        # 接收数据队列，每条消息为 (值宽度, 负载)
+        # handle_client放入、recv_values取出，由队列完成等待和唤醒，无需额外的锁和事件
+        self.received_data: asyncio.Queue = asyncio.Queue()
         
         # 服务器相关属性
         self.server = None
@@ -64,20 +105,16 @@ class AsyncSocketCommunication:
         self.server_task = None
         
         # 连接池管理
-        self.connections: Dict[str, asyncio.StreamWriter] = {}
-        self.connection_locks: Dict[str, asyncio.Lock] = {}
+        # 以 (地址, 端口) 元组为键，避免每次发送格式化字符串
+        self.connections: Dict[Tuple[str, int], asyncio.StreamWriter] = {}
+        self.connection_locks: Dict[Tuple[str, int], asyncio.Lock] = {}
         
-        # 通信统计
+        # 通信统计，计数只在同一事件循环中两次await之间更新，无需加锁
         self.send_data_size = 0
         self.recv_data_size = 0
         self.send_rounds = 0
         self.recv_rounds = 0
         self.tls_handshake_count = 0  # TLS握手次数
-        self.stats_lock = asyncio.Lock()
-        self.data_lock = asyncio.Lock()
-        
-        # 添加数据到达事件，避免轮询导致的死锁问题
-        self.data_available = asyncio.Event()
     
     def _setup_ssl_contexts(self):
         """初始化SSL上下文"""
@@ -133,37 +170,36 @@ class AsyncSocketCommunication:
         处理客户端连接（异步方式）
         """
         addr = writer.get_extra_info('peername')
-        self.logger.info(f"接受来自 {addr} 的连接")
+        self.logger.debug("接受来自 %s 的连接", addr)
+        set_nodelay(writer)
         
         try:
             while self.is_running:
                 # 异步接收数据
                 try:
-                    # 添加超时读取，避免永久阻塞
-                    data = await asyncio.wait_for(reader.readline(), timeout=30.0)
-                    if not data:
-                        break
+                    # 添加超时读取帧头，避免永久阻塞(超时不会丢弃缓冲区中的部分数据)
+                    header = await asyncio.wait_for(reader.readexactly(FRAME_HEADER.size), timeout=30.0)
                 except asyncio.TimeoutError:
                     # 连接超时检查
                     if writer.is_closing():
                         break
                     continue
+                except asyncio.IncompleteReadError:
+                    # 对端关闭连接
+                    break
+                
+                # 帧头到达后负载紧随其后，按长度读取完整负载
+                value_bytes, payload_len = FRAME_HEADER.unpack(header)
+                try:
+                    payload = await reader.readexactly(payload_len)
+                except asyncio.IncompleteReadError:
+                    break
                 
                 # 更新接收统计（仅字节计数，轮次计数移到recv_values）
-                async with self.stats_lock:
-                    self.recv_data_size += len(data)
+                self.recv_data_size += FRAME_HEADER.size + payload_len
                 
-                # 解码数据并存储
-                try:
-                    decoded_data = data.decode('utf-8').strip()
-                    self.logger.info(f"收到消息: {decoded_data}")
-                    async with self.data_lock:
-                        self.received_data.append(decoded_data)
-                        # 优化：数据添加后立即设置事件，无论之前状态如何
-                        # 这确保recv_values方法能够及时获知有新数据到达
-                        self.data_available.set()
-                except UnicodeDecodeError:
-                    self.logger.warning("无法解码数据")
+                self.logger.debug("收到消息: %d 字节", payload_len)
+                self.received_data.put_nowait((value_bytes, payload))
         
         except Exception as e:
             self.logger.error(f"处理客户端错误: {e}")
@@ -176,38 +212,27 @@ class AsyncSocketCommunication:
             except Exception:
                 pass
             
-            self.logger.info(f"连接关闭 {addr}")
-            
-            # 确保事件被设置，防止任何等待操作永久阻塞
-            if not self.data_available.is_set():
-                self.data_available.set()
+            self.logger.debug("连接关闭 %s", addr)
     
     async def get_connection(self, target_ip: str, target_port: int) -> asyncio.StreamWriter:
         """
         获取或创建与目标地址的连接
         使用连接池避免频繁创建和销毁连接
         """
-        conn_key = f"{target_ip}:{target_port}"
-        
-        # 检查连接是否已存在且有效
-        if conn_key in self.connections:
-            writer = self.connections[conn_key]
-            if not writer.is_closing():
-                return writer
-            else:
-                # 清理已关闭的连接
-                del self.connections[conn_key]
-                if conn_key in self.connection_locks:
-                    del self.connection_locks[conn_key]
+        conn_key = (target_ip, target_port)
         
-        # 为该连接创建锁，避免并发创建
-        if conn_key not in self.connection_locks:
-            self.connection_locks[conn_key] = asyncio.Lock()
+        # 快速路径：连接已存在且有效时只做一次字典查找，不获取锁
+        writer = self.connections.get(conn_key)
+        if writer is not None and not writer.is_closing():
+            return writer
         
-        async with self.connection_locks[conn_key]:
+        # 只有需要新建连接时才获取该连接的锁，避免并发创建；
+        # 锁创建后保留，不随失效连接删除，防止等待中的任务持有已被替换的锁
+        async with self.connection_locks.setdefault(conn_key, asyncio.Lock()):
             # 再次检查，防止在获取锁期间已被创建
-            if conn_key in self.connections and not self.connections[conn_key].is_closing():
-                return self.connections[conn_key]
+            writer = self.connections.get(conn_key)
+            if writer is not None and not writer.is_closing():
+                return writer
             
             # 创建新连接（支持TLS，带超时和重试）
             ssl_context = self.client_ssl_context if self.use_tls else None
@@ -223,15 +248,15 @@ class AsyncSocketCommunication:
                         ),
                         timeout=connect_timeout
                     )
+                    set_nodelay(writer)
                     self.connections[conn_key] = writer
                     
                     # 统计TLS握手
                     if self.use_tls:
-                        async with self.stats_lock:
-                            self.tls_handshake_count += 1
+                        self.tls_handshake_count += 1
                     
                     tls_status = "TLS" if self.use_tls else "明文"
-                    self.logger.info(f"建立连接到 {target_ip}:{target_port} ({tls_status})")
+                    self.logger.debug("建立连接到 %s:%s (%s)", target_ip, target_port, tls_status)
                     return writer
                 except asyncio.TimeoutError:
                     self.logger.warning(f"连接到 {target_ip}:{target_port} 超时 (尝试 {retry+1}/{max_connect_retries})")
@@ -246,12 +271,9 @@ class AsyncSocketCommunication:
                     else:
                         raise
     
-    async def send_data(self, target_ip: str, target_port: int, data: str, retries: int = 3) -> int:
-        """
-        异步发送数据到目标地址（带重试机制和连接池）
-        确保数据以精确整数形式发送，不使用科学计数法
-        """
-        # 确保数据不会以科学计数法形式发送
+    @staticmethod
+    def _normalize_text(data: Union[str, int, float]) -> str:
+        """确保文本数据不会以科学计数法形式发送"""
         try:
             # 尝试将数据转换为浮点数然后再转换为整数，这样可以避免科学计数法
             # 这适用于发送整数的情况
@@ -261,14 +283,79 @@ class AsyncSocketCommunication:
                 else:
                     num_value = data
                 # 检查是否为整数
-                if num_value.is_integer():
-                    data = str(int(num_value))
-        except (ValueError, TypeError):
+                if float(num_value).is_integer():
+                    return str(int(num_value))
+        except (ValueError, TypeError, OverflowError):
             # 如果转换失败，保留原始数据
             pass
+        return str(data)
+    
+    async def send_data(
+        self,
+        target_ip: str,
+        target_port: int,
+        data: Union[str, bytes],
+        retries: int = 3,
+        value_bytes: int = 0
+    ) -> int:
+        """
+        异步发送数据到目标地址（带重试机制和连接池）
+        文本数据确保以精确整数形式发送，不使用科学计数法；
+        二进制数据为定宽整数拼接，value_bytes为每个值的字节宽度
+        """
+        if isinstance(data, bytes):
+            payload = data
+        else:
+            payload = self._normalize_text(data).encode('utf-8')
+            value_bytes = 0
+        return await self.send_frames(target_ip, target_port, [(payload, value_bytes)], retries)
+    
+    def _consume_bandwidth(self, nbytes: int) -> float:
+        """
+        从发送令牌桶中取出nbytes字节的令牌
+        令牌不足时记为欠额，后续消息排在其后等待
+        
+        Returns:
+            因带宽限制需要等待的时间(秒)
+        """
+        now = time.monotonic()
+        self._tokens = min(
+            self.max_bandwidth,
+            self._tokens + (now - self._last_refill) * self.max_bandwidth
+        )
+        self._last_refill = now
+        
+        self._tokens -= nbytes
+        if self._tokens >= 0:
+            return 0.0
+        return -self._tokens / self.max_bandwidth
+    
+    async def send_frames(
+        self,
+        target_ip: str,
+        target_port: int,
+        frames: List[Tuple[bytes, int]],
+        retries: int = 3
+    ) -> int:
+        """
+        将发往同一目标的多条消息一次写入连接，只drain一次
+        每条消息保留各自的帧头，接收方仍逐条收到
         
-        data_bytes = (data + '\n').encode('utf-8')  # 添加换行符作为分隔符
-        data_len = len(data_bytes)
+        Args:
+            target_ip: 目标地址
+            target_port: 目标端口
+            frames: (负载, 值宽度) 列表
+            retries: 最大重试次数
+            
+        Returns:
+            发送的总字节数，失败时返回0
+        """
+        # 以帧头标明负载长度，接收方无需分隔符
+        buffers = []
+        for payload, value_bytes in frames:
+            buffers.append(FRAME_HEADER.pack(value_bytes, len(payload)))
+            buffers.append(payload)
+        data_len = sum(len(buf) for buf in buffers)
         attempt = 0
         
         while attempt <= retries:
@@ -276,36 +363,25 @@ class AsyncSocketCommunication:
                 writer = await self.get_connection(target_ip, target_port)
                 
                 if self.max_bandwidth:
-                    # 带宽限制发送
-                    sent = 0
-                    chunk_size = min(self.max_bandwidth // 10, data_len)  # 分10块发送
-                    
-                    while sent < data_len:
-                        chunk = data_bytes[sent:sent+chunk_size]
-                        writer.write(chunk)
-                        await writer.drain()
-                        
-                        sent += len(chunk)
-                        # 控制带宽
-                        await asyncio.sleep(len(chunk) / self.max_bandwidth)
-                else:
-                    # 无带宽限制发送
-                    writer.write(data_bytes)
-                    await writer.drain()
+                    # 带宽限制：令牌不足时等待一次，之后整条消息一次写入
+                    delay = self._consume_bandwidth(data_len)
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+                
+                # 所有帧头与负载一次提交(writelines)，免去拼接拷贝，只drain一次
+                writer.writelines(buffers)
+                await writer.drain()
                 
                 # 更新发送统计
-                async with self.stats_lock:
-                    self.send_data_size += data_len
-                    self.send_rounds += 1
+                self.send_data_size += data_len
+                self.send_rounds += len(frames)
                 
-                self.logger.info(f"发送数据到 {target_ip}:{target_port}: {data}")
+                self.logger.debug("发送数据到 %s:%s: %d 字节", target_ip, target_port, data_len)
                 return data_len
                 
             except Exception as e:
                 # 连接失败时清理
-                conn_key = f"{target_ip}:{target_port}"
-                if conn_key in self.connections:
-                    del self.connections[conn_key]
+                self.connections.pop((target_ip, target_port), None)
                 
                 self.logger.warning(f"发送错误: {e}, 尝试 {attempt}/{retries}")
                 attempt += 1
@@ -314,136 +390,158 @@ class AsyncSocketCommunication:
                 if attempt <= retries:
                     await asyncio.sleep(0.1 * (2 ** attempt) + random.random() * 0.1)
         
-        self.logger.error(f"发送失败，已达最大重试次数: {data}")
+        self.logger.error(f"发送失败，已达最大重试次数: {data_len} 字节")
         return 0
     
-    async def recv_values(self, expected_count: int, wait_sec: float = 5.0) -> List[int]:
+    # 批量消息中各值之间的分隔符
+    BULK_SEPARATOR = ','
+    
+    def _parse_int(self, data_str: str) -> int:
         """
-        异步接收指定数量的值
-        使用优化的数据到达事件机制，避免死锁
-        直接处理精确整数值，不再需要处理科学计数法
-        """
-        deadline = asyncio.get_event_loop().time() + wait_sec
-        
-        while True:
-            # 检查是否有足够数据
-            async with self.data_lock:
-                # 先清除事件，确保下一次数据到达时会正确触发
-                # 只有当收到数据时才会重新设置事件
-                if self.data_available.is_set():
-                    # 如果事件已设置但数据不足，先清除它
-                    # 这样后续新数据到达时handle_client会重新设置它
-                    self.data_available.clear()
-                    
-                available = len(self.received_data)
-                if available >= expected_count:
-                    # 取出需要的数据，假设接收到的都是精确整数
-                    res = []
-                    for _ in range(expected_count):
-                        data_str = self.received_data.pop(0)
-                        # 直接转换为整数
-                        # 如果数据包含科学计数法或小数，尝试精确转换
-                        try:
-                            if 'e' in data_str.lower():
-                                # 如果仍然收到科学计数法，使用精确转换
-                                base, exp = data_str.lower().split('e')
-                                if '.' in base:
-                                    base_int_part, base_dec_part = base.split('.')
-                                    base_dec_part = base_dec_part.rstrip('0')
-                                    combined_int = int(base_int_part + base_dec_part)
-                                    exp = int(exp) - len(base_dec_part)
-                                else:
-                                    combined_int = int(base)
-                                    exp = int(exp)
-                                result = combined_int * (10 ** exp)
-                                res.append(result)
-                            elif '.' in data_str:
-                                # 处理小数，确保精确转换为整数
-                                res.append(int(float(data_str)))
-                            else:
-                                # 直接转换整数
-                                res.append(int(data_str))
-                        except ValueError:
-                            self.logger.error(f"无法转换数据为整数: {data_str}")
-                            # 尝试浮点数转换
-                            try:
-                                res.append(int(float(data_str)))
-                            except:
-                                # 如果都失败，记录错误并返回0
-                                res.append(0)
-                    # 记录接收轮次
-                    async with self.stats_lock:
-                        self.recv_rounds += 1
-                    # 如果还有更多数据，重新设置事件通知
-                    if self.received_data:
-                        self.data_available.set()
-                    return res
-            
-            # 检查是否超时
-            current_time = asyncio.get_event_loop().time()
-            if current_time > deadline:
-                async with self.data_lock:
-                    self.logger.warning(f"{self.name} 等待接收超时, 目前已有 {len(self.received_data)} 条.")
-                    # 返回已有的所有数据
-                    res = []
-                    while self.received_data and len(res) < expected_count:
-                        data_str = self.received_data.pop(0)
-                        # 直接转换为整数
-                        try:
-                            if 'e' in data_str.lower():
-                                # 如果仍然收到科学计数法，使用精确转换
-                                base, exp = data_str.lower().split('e')
-                                if '.' in base:
-                                    base_int_part, base_dec_part = base.split('.')
-                                    base_dec_part = base_dec_part.rstrip('0')
-                                    combined_int = int(base_int_part + base_dec_part)
-                                    exp = int(exp) - len(base_dec_part)
-                                else:
-                                    combined_int = int(base)
-                                    exp = int(exp)
-                                result = combined_int * (10 ** exp)
-                                res.append(result)
-                            elif '.' in data_str:
-                                # 处理小数，确保精确转换为整数
-                                res.append(int(float(data_str)))
-                            else:
-                                # 直接转换整数
-                                res.append(int(data_str))
-                        except ValueError:
-                            self.logger.error(f"无法转换数据为整数: {data_str}")
-                            # 尝试浮点数转换
-                            try:
-                                res.append(int(float(data_str)))
-                            except:
-                                # 如果都失败，记录错误并返回0
-                                res.append(0)
-                    # 记录接收轮次
-                    async with self.stats_lock:
-                        self.recv_rounds += 1
-                    # 如果还有更多数据，重新设置事件通知
-                    if self.received_data:
-                        self.data_available.set()
-                    return res
-            
-            # 计算剩余等待时间
-            remaining_time = deadline - current_time
-            if remaining_time <= 0:
-                continue  # 超时，继续循环检查
+        将收到的字符串转换为整数
+        整数均以二进制发送，文本负载只来自发送方已规整为整数字符串的其他值，转换失败时返回0
+        """
+        try:
+            return int(data_str)
+        except ValueError:
+            try:
+                return int(float(data_str))
+            except (ValueError, OverflowError):
+                self.logger.error(f"无法转换数据为整数: {data_str}")
+                return 0
+    
+    def _parse_values(self, value_bytes: int, payload: bytes) -> List[int]:
+        """
+        将一条消息的负载解析为整数列表
+        定宽二进制负载按宽度切分后以大端序解析；变长负载按长度前缀逐个解析；
+        文本负载按BULK_SEPARATOR切分
+        """
+        if value_bytes == VARIABLE_WIDTH:
+            values = []
+            offset = 0
+            while offset < len(payload):
+                (length,) = VALUE_LENGTH.unpack_from(payload, offset)
+                offset += VALUE_LENGTH.size
+                values.append(int.from_bytes(payload[offset:offset + length], 'big', signed=True))
+                offset += length
+            return values
+        if value_bytes > 0:
+            return [
+                int.from_bytes(payload[i:i + value_bytes], 'big')
+                for i in range(0, len(payload), value_bytes)
+            ]
+        try:
+            text = payload.decode('utf-8').strip()
+        except UnicodeDecodeError:
+            self.logger.warning("无法解码数据")
+            return [0]
+        return [self._parse_int(part) for part in text.split(self.BULK_SEPARATOR)]
+    
+    @staticmethod
+    def encode_values(values: List[int], value_bytes: int) -> Tuple[bytes, int]:
+        """
+        将整数列表编码为消息负载
+        
+        所有值均可用value_bytes字节表示时编码为定宽大端序字节串，
+        否则编码为带长度前缀的变长有符号整数
+        
+        Returns:
+            (负载, 值宽度)
+        """
+        if value_bytes > 0:
+            limit = 1 << (8 * value_bytes)
+            if all(0 <= v < limit for v in values):
+                return b''.join(int(v).to_bytes(value_bytes, 'big') for v in values), value_bytes
+        parts = []
+        for v in values:
+            v = int(v)
+            raw = v.to_bytes(v.bit_length() // 8 + 1, 'big', signed=True)
+            parts.append(VALUE_LENGTH.pack(len(raw)))
+            parts.append(raw)
+        return b''.join(parts), VARIABLE_WIDTH
+    
+    async def _recv_messages(self, expected_count: int, wait_sec: float) -> List[Tuple[int, bytes]]:
+        """
+        异步接收指定数量的消息(每条消息为 (值宽度, 负载))
+        从接收队列依次取出，超时时返回已收到的消息
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + wait_sec
+        queue = self.received_data
+        res = []
+        
+        while len(res) < expected_count:
+            # 已到达的消息直接取出，无需等待
+            if not queue.empty():
+                res.append(queue.get_nowait())
+                continue
             
-            # 等待数据到达或超时
-            self.logger.debug(f"{self.name} 等待数据，剩余时间: {remaining_time:.2f}秒")
+            remaining_time = deadline - loop.time()
             try:
-                # 等待数据到达或超时
-                await asyncio.wait_for(self.data_available.wait(), timeout=remaining_time)
-                # 数据到达后，清除事件以避免虚假唤醒
-                self.data_available.clear()
+                if remaining_time <= 0:
+                    raise asyncio.TimeoutError
+                self.logger.debug("%s 等待数据，剩余时间: %.2f秒", self.name, remaining_time)
+                res.append(await asyncio.wait_for(queue.get(), timeout=remaining_time))
             except asyncio.TimeoutError:
-                # 超时，记录并继续循环检查
-                self.logger.debug(f"{self.name} 等待超时，继续检查数据")
-            except Exception as e:
-                # 其他异常，记录并继续尝试
-                self.logger.error(f"{self.name} 接收数据时发生异常: {e}")
-            # 继续下一轮循环检查
+                self.logger.warning(f"{self.name} 等待接收超时, 目前已有 {len(res)} 条.")
+                break
+        
+        # 记录接收轮次
+        self.recv_rounds += 1
+        return res
+    
+    async def recv_values(self, expected_count: int, wait_sec: float = 5.0) -> List[int]:
+        """
+        异步接收指定数量的值
+        直接处理精确整数值，不再需要处理科学计数法；负载为空的消息记录警告后跳过
+        """
+        messages = await self._recv_messages(expected_count, wait_sec)
+        values = []
+        for message in messages:
+            parsed = self._parse_values(*message)
+            if not parsed:
+                self.logger.warning(f"{self.name} 收到空负载消息，已跳过")
+                continue
+            values.append(parsed[0])
+        return values
+    
+    async def send_values_bulk(
+        self,
+        target_ip: str,
+        target_port: int,
+        values: List[int],
+        retries: int = 3,
+        value_bytes: int = 0
+    ) -> int:
+        """
+        将多个整数合并为一条消息发送到目标地址
+        各值均能以value_bytes字节表示时以定宽大端序字节发送，否则以变长有符号整数发送
+        """
+        payload, width = self.encode_values(values, value_bytes)
+        return await self.send_data(target_ip, target_port, payload, retries, value_bytes=width)
+    
+    async def recv_values_bulk(self, expected_count: int, wait_sec: float = 5.0) -> List[List[int]]:
+        """
+        异步接收指定数量的批量消息，每条消息解析为一个整数列表
+        单值消息解析为长度为1的列表
+        """
+        messages = await self._recv_messages(expected_count, wait_sec)
+        return [self._parse_values(*message) for message in messages]
+    
+    async def _close_writer(self, key: Tuple[str, int], writer: asyncio.StreamWriter) -> bool:
+        """
+        关闭一个出站连接，最多等待0.05秒，超时则直接中止传输
+        """
+        try:
+            writer.close()
+            await asyncio.wait_for(writer.wait_closed(), timeout=0.05)
+            self.logger.debug("%s 关闭连接到 %s", self.name, key)
+            return True
+        except Exception as e:
+            # 正在拆除连接，无需等待对端确认，直接中止
+            writer.transport.abort()
+            self.logger.warning(f"{self.name} 关闭连接 {key} 超时或错误: {e}")
+            return False
     
     async def close(self):
         """关闭服务器并释放所有连接（优化版本，避免卡住）"""
@@ -451,12 +549,9 @@ class AsyncSocketCommunication:
         # - 服务器关闭超时 ：至少1-2秒
         # - 服务器任务取消超时 ：至少0.5秒
         # - 连接关闭超时 ：至少0.5秒
-        self.logger.info(f"{self.name} 开始关闭连接...")
+        self.logger.debug("%s 开始关闭连接...", self.name)
         self.is_running = False
         
-        # 确保事件被设置，唤醒所有等待的recv_values
-        self.data_available.set()
-        
         # 并行处理服务器关闭和连接关闭，避免顺序等待导致的卡住
         server_close_tasks = []
         
@@ -466,14 +561,14 @@ class AsyncSocketCommunication:
             # 使用更短的超时任务
             server_close_tasks.append(asyncio.create_task(
                 asyncio.wait_for(self.server.wait_closed(), timeout=0.05)))
-            self.logger.debug(f"{self.name} 服务器开始关闭")
+            self.logger.debug("%s 服务器开始关闭", self.name)
         
         # 等待服务器任务完成（带更短超时）
         if self.server_task:
             self.server_task.cancel()
             server_close_tasks.append(asyncio.create_task(
                 asyncio.wait_for(self.server_task, timeout=0.05)))
-            self.logger.debug(f"{self.name} 服务器任务开始取消")
+            self.logger.debug("%s 服务器任务开始取消", self.name)
         
         # 处理服务器相关任务
         if server_close_tasks:
@@ -483,37 +578,34 @@ class AsyncSocketCommunication:
                     if isinstance(result, Exception):
                         self.logger.warning(f"{self.name} 服务器关闭任务 {i} 异常: {result}")
                     else:
-                        self.logger.debug(f"{self.name} 服务器关闭任务 {i} 完成")
+                        self.logger.debug("%s 服务器关闭任务 %d 完成", self.name, i)
             except Exception as e:
                 self.logger.error(f"{self.name} 处理服务器关闭任务时发生错误: {e}")
-            self.logger.info(f"{self.name} 服务器关闭完成")
+            self.logger.debug("%s 服务器关闭完成", self.name)
         
         # 并行关闭所有连接，每个连接最多等待0.05秒
-        close_tasks = []
-        for conn_key, writer in list(self.connections.items()):
-            async def close_conn(key, w):
-                try:
-                    w.close()
-                    # 最多等待0.05秒关闭连接
-                    await asyncio.wait_for(w.wait_closed(), timeout=0.05)
-                    self.logger.debug(f"{self.name} 关闭连接到 {key}")
-                    return True
-                except Exception as e:
-                    self.logger.warning(f"{self.name} 关闭连接 {key} 超时或错误: {e}")
-                    return False
-            
-            close_tasks.append(close_conn(conn_key, writer))
-        
-        # 等待所有连接关闭任务完成
-        if close_tasks:
-            await asyncio.gather(*close_tasks, return_exceptions=True)
+        if self.connections:
+            await asyncio.gather(
+                *(self._close_writer(key, writer) for key, writer in list(self.connections.items())),
+                return_exceptions=True
+            )
         
         # 清空连接池和数据
         self.connections.clear()
         self.connection_locks.clear()
-        self.received_data.clear()
+        self.received_data = asyncio.Queue()
         
-        self.logger.info(f"{self.name} 所有连接关闭完成")
+        self.logger.debug("%s 所有连接关闭完成", self.name)
+    
+    def reset_stats(self) -> None:
+        """
+        重置通信统计，参与方被复用于新的计算任务时调用
+        """
+        self.send_data_size = 0
+        self.recv_data_size = 0
+        self.send_rounds = 0
+        self.recv_rounds = 0
+        self.tls_handshake_count = 0
     
     def get_communication_stats(self) -> Dict[str, int]:
         """
@@ -530,34 +622,38 @@ class AsyncSocketCommunication:
 class PortManager:
     """
     端口管理器，负责动态分配和释放端口
+    
+    可用端口初始时随机打乱放入队列，从队首分配、释放后放回队尾，
+    分配和释放均为O(1)，且刚释放的端口最晚被重新使用
     """
     def __init__(self, min_port: int = 6100, max_port: int = 7500):
         self.min_port = min_port
         self.max_port = max_port
-        self.available_ports = set(range(min_port, max_port + 1))
-        self.port_lock = asyncio.Lock()
+        ports = list(range(min_port, max_port + 1))
+        random.shuffle(ports)
+        self.available_ports = collections.deque(ports)
+        self.allocated_ports = set()
         self.logger = logging.getLogger("PortManager")
     
     async def get_port(self) -> int:
         """获取一个可用端口"""
-        async with self.port_lock:
-            if not self.available_ports:
-                raise RuntimeError("没有可用的端口，请检查端口配置")
-            
-            # 随机选择一个端口，避免连续使用同一端口
-            port = random.choice(list(self.available_ports))
-            self.available_ports.remove(port)
-            self.logger.info(f"分配端口: {port}")
-            return port
+        # 方法内没有await，在单个事件循环中天然互斥，无需加锁
+        if not self.available_ports:
+            raise RuntimeError("没有可用的端口，请检查端口配置")
+        
+        port = self.available_ports.popleft()
+        self.allocated_ports.add(port)
+        self.logger.debug("分配端口: %s", port)
+        return port
     
     async def release_port(self, port: int):
         """释放端口"""
-        async with self.port_lock:
-            if self.min_port <= port <= self.max_port:
-                self.available_ports.add(port)
-                self.logger.info(f"释放端口: {port}")
-            else:
-                self.logger.warning(f"尝试释放无效端口: {port}")
+        if port in self.allocated_ports:
+            self.allocated_ports.remove(port)
+            self.available_ports.append(port)
+            self.logger.debug("释放端口: %s", port)
+        elif not self.min_port <= port <= self.max_port:
+            self.logger.warning(f"尝试释放无效端口: {port}")
     
     def get_available_count(self) -> int:
         """获取可用端口数量"""
@@ -4,6 +4,12 @@
 
 from sympy import isprime
 
+# gmpy2为可选依赖，可用时使用GMP大整数加速模运算
+try:
+    import gmpy2
+except ImportError:
+    gmpy2 = None
+
 class PrimeOrderCyclicGroup:
     def __init__(self, p: int, g: int):
         """
@@ -15,6 +21,23 @@ class PrimeOrderCyclicGroup:
         """
         self.p = p
         self.g = g
+        # 模乘使用的模数，gmpy2可用时为mpz，约减由GMP完成
+        self._p_mod = gmpy2.mpz(p) if gmpy2 is not None else p
+
+    def mulmod(self, *factors):
+        """
+        计算若干因子的乘积 mod p，只在最后做一次约减
+        
+        Args:
+            factors: 参与相乘的域元素
+            
+        Returns:
+            乘积 mod p
+        """
+        result = 1
+        for factor in factors:
+            result = result * factor
+        return result % self._p_mod
 
     def extended_gcd(self, a, b):
         """
@@ -49,11 +72,11 @@ class PrimeOrderCyclicGroup:
         Raises:
             ValueError: 如果a和p不互质，无法求逆元
         """
-        gcd, x, y = self.extended_gcd(a, self.p)
-        if gcd != 1:
-            raise ValueError(f"{a} 和 {self.p} 不是互质的，无法求逆元")
-        else:
-            return x % self.p  # 确保逆元在 [0, p-1] 范围内
+        # 使用内置的C实现模逆，避免递归的扩展欧几里得算法
+        try:
+            return pow(a, -1, self.p)
+        except ValueError:
+            raise ValueError(f"{a} 和 {self.p} 不是互质的，无法求逆元") from None
 
     def check_inverse(self, a, a_inv):
         """
@@ -4,7 +4,7 @@
 
 import logging
 import asyncio
-from typing import List, Union, Optional, Tuple
+from typing import List, Union, Dict, Optional
 
 import sys
 import os
@@ -13,7 +13,8 @@ import os
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))) 
 
 from utils.config import HOST
-from communication.async_socket_communication import AsyncSocketCommunication
+from utils.utils import prss_one_share, prss_zero_share
+from communication.async_socket_communication import AsyncSocketCommunication, field_bytes, INTEGER_TYPES
 
 logger = logging.getLogger('lagrange_protocol')
 
@@ -27,7 +28,18 @@ class Participant:
       - 公共 x^*
       - q (素数模数)
     """
-    def __init__(self, name: str, port: int, x: int, x_star: int, q: int) -> None:
+    # 是否需要由工厂补充网络模拟条件
+    needs_network_condition = False
+    
+    def __init__(
+        self,
+        name: str,
+        port: int,
+        x: int,
+        x_star: int,
+        q: int,
+        prss_seeds: Optional[Dict[str, bytes]] = None
+    ) -> None:
         """
         初始化参与方
         
@@ -37,12 +49,21 @@ class Participant:
             x: 私有坐标
             x_star: 插值点坐标
             q: 素数模数
+            prss_seeds: 与其他参与方的共享种子，键为对方名称
         """
         self.name = name
         self.x = x % q
         self.x_star = x_star % q
+        # x^*-x 在所有三元组/四元组中不变，创建时计算一次
+        self.x_star_minus_x = (self.x_star - self.x) % q
         self.q = q
         self.host = HOST
+        # 域元素的定宽编码字节数
+        self.value_bytes = field_bytes(q)
+        # x的幂次缓存 {k: x^k mod q}
+        self.x_pow_cache: Dict[int, int] = {}
+        # 伪随机分享(PRSS)使用的成对共享种子 {对方名称: 种子}
+        self.prss_seeds: Dict[str, bytes] = dict(prss_seeds or {})
 
         # 异步通信对象
         self.comm = AsyncSocketCommunication(name, port)
@@ -55,6 +76,58 @@ class Participant:
         """关闭异步通信服务"""
         await self.comm.close()
     
+    def xpow(self, k: int, p: int) -> int:
+        """
+        计算 x^k mod p，结果按指数缓存供多次协议调用复用
+        已缓存 x^(k-1) 时只需再做一次模乘
+        
+        Args:
+            k: 指数
+            p: 素数模数
+            
+        Returns:
+            x^k mod p
+        """
+        value = self.x_pow_cache.get(k)
+        if value is None:
+            prev = self.x_pow_cache.get(k - 1)
+            if prev is not None:
+                value = (prev * self.x) % p
+            else:
+                value = pow(self.x, k, p)
+            self.x_pow_cache[k] = value
+        return value
+    
+    def prss_one_share(self, peers: List[str], session: bytes, index: int) -> int:
+        """
+        由与peers的共享种子非交互地生成本方的1分享
+        
+        Args:
+            peers: 本次计算中其他参与方的名称
+            session: 本次协议实例的会话标识
+            index: 分享序号
+            
+        Returns:
+            本方的1分享，同一会话、同一序号下所有参与方的分享乘积为1 mod q
+        """
+        seeds = {peer: self.prss_seeds[peer] for peer in peers}
+        return prss_one_share(seeds, self.name, session, index, self.q)
+    
+    def prss_zero_share(self, peers: List[str], session: bytes, index: int) -> int:
+        """
+        由与peers的共享种子非交互地生成本方的0分享
+        
+        Args:
+            peers: 本次计算中其他参与方的名称
+            session: 本次协议实例的会话标识
+            index: 分享序号
+            
+        Returns:
+            本方的0分享，同一会话、同一序号下所有参与方的分享之和为0 mod q
+        """
+        seeds = {peer: self.prss_seeds[peer] for peer in peers}
+        return prss_zero_share(seeds, self.name, session, index, self.q)
+    
     async def send_value(self, other: 'Participant', value_str: Union[str, int, float]) -> None:
         """
         异步发送字符串给other
@@ -65,23 +138,25 @@ class Participant:
             value_str: 要发送的值
         """
         # 确保数据以整数形式发送，避免科学计数法
-        if isinstance(value_str, (int, float)):
-            # 转换为整数并确保以字符串形式发送
+        if type(value_str) in INTEGER_TYPES:
+            # 整数以二进制发送：域元素为定宽大端序字节，负数或超宽值为变长编码
+            await self.send_values_bulk(other, [value_str])
+            return
+        elif isinstance(value_str, (int, float)):
             data_to_send = str(int(value_str))
+        elif isinstance(value_str, str) and value_str.isdigit():
+            # 纯数字字符串无需解析
+            data_to_send = value_str
         else:
-            # 检查字符串是否可能是科学计数法表示
             try:
-                # 尝试将字符串解析为浮点数，然后转换为整数
-                num = float(value_str)
-                if 'e' in value_str.lower() or '.' in value_str:
-                    # 如果是科学计数法或包含小数点，转换为整数
-                    data_to_send = str(int(num))
-                else:
-                    # 否则保持原字符串
-                    data_to_send = value_str
+                # 先按整数精确解析(保留大整数精度)，失败再按科学计数法或小数解析
+                data_to_send = str(int(value_str))
             except (ValueError, TypeError):
-                # 如果不是数字，保持原字符串
-                data_to_send = value_str
+                try:
+                    data_to_send = str(int(float(value_str)))
+                except (ValueError, TypeError, OverflowError):
+                    # 如果不是数字，保持原字符串
+                    data_to_send = value_str
         
         await self.comm.send_data(
             target_ip=other.host,
@@ -89,6 +164,21 @@ class Participant:
             data=data_to_send
         )
     
+    async def send_values_bulk(self, other: 'Participant', values: List[int]) -> None:
+        """
+        将发往同一参与方的多个值合并为一条消息异步发送
+        
+        Args:
+            other: 接收消息的参与方
+            values: 要发送的整数值列表
+        """
+        await self.comm.send_values_bulk(
+            target_ip=other.host,
+            target_port=other.comm.port,
+            values=values,
+            value_bytes=self.value_bytes
+        )
+    
     async def recv_values(self, expected_count: int, wait_sec: float = None) -> List[int]:
         """
         异步接收指定数量的值
@@ -104,3 +194,19 @@ class Participant:
         if wait_sec is None:
             wait_sec = 15.0 if self.comm.use_tls else 5.0
         return await self.comm.recv_values(expected_count, wait_sec)
+    
+    async def recv_values_bulk(self, expected_count: int, wait_sec: float = None) -> List[List[int]]:
+        """
+        异步接收指定数量的批量消息
+        
+        Args:
+            expected_count: 期望接收的消息数量
+            wait_sec: 超时时间（秒），None时根据TLS状态自动设置
+            
+        Returns:
+            每条消息对应一个整数列表
+        """
+        # TLS连接需要更长的等待时间
+        if wait_sec is None:
+            wait_sec = 15.0 if self.comm.use_tls else 5.0
+        return await self.comm.recv_values_bulk(expected_count, wait_sec)
@@ -5,7 +5,6 @@
 import logging
 import asyncio
 import random
-import zlib
 import os
 from typing import List, Union, Optional, Tuple, Any, Dict
 
@@ -15,8 +14,9 @@ import os
 # 添加父目录到Python导入路径
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))) 
 
-from communication.async_socket_communication import AsyncSocketCommunication
+from communication.async_socket_communication import AsyncSocketCommunication, field_bytes, INTEGER_TYPES
 from utils.config import HOST, DEFAULT_RECV_TIMEOUT, MIN_RECV_TIMEOUT, MAX_RECV_TIMEOUT, MAX_RETRY_COUNT, RETRY_DELAY
+from utils.utils import prss_one_share, prss_zero_share
 from network.network_simulator import NetworkSimulator, NetworkCondition, NETWORK_CONDITIONS
 
 logger = logging.getLogger('lagrange_protocol')
@@ -32,6 +32,9 @@ class EnhancedParticipant:
       - q (素数模数)
       - 网络模拟器
     """
+    # 是否需要由工厂补充网络模拟条件
+    needs_network_condition = True
+    
     def __init__(
         self, 
         name: str, 
@@ -39,7 +42,8 @@ class EnhancedParticipant:
         x: int, 
         x_star: int, 
         q: int,
-        network_condition: Union[str, NetworkCondition] = "local"
+        network_condition: Union[str, NetworkCondition] = "local",
+        prss_seeds: Optional[Dict[str, bytes]] = None
     ) -> None:
         """
         初始化参与方
@@ -51,12 +55,21 @@ class EnhancedParticipant:
             x_star: 插值点坐标
             q: 素数模数
             network_condition: 网络条件名称或对象
+            prss_seeds: 与其他参与方的共享种子，键为对方名称
         """
         self.name = name
         self.x = x % q
         self.x_star = x_star % q
+        # x^*-x 在所有三元组/四元组中不变，创建时计算一次
+        self.x_star_minus_x = (self.x_star - self.x) % q
         self.q = q
         self.host = HOST
+        # 域元素的定宽编码字节数
+        self.value_bytes = field_bytes(q)
+        # x的幂次缓存 {k: x^k mod q}
+        self.x_pow_cache: Dict[int, int] = {}
+        # 伪随机分享(PRSS)使用的成对共享种子 {对方名称: 种子}
+        self.prss_seeds: Dict[str, bytes] = dict(prss_seeds or {})
 
         # 异步通信对象
         self.comm = AsyncSocketCommunication(name, port)
@@ -88,6 +101,10 @@ class EnhancedParticipant:
         self.total_bytes_sent = 0
         self.total_network_delay = 0.0
         
+        # 自适应超时倍数的缓存，首次接收时按当前网络条件计算
+        self._timeout_condition: Optional[NetworkCondition] = None
+        self._timeout_factor: Optional[float] = None
+        
     @property
     def network_condition(self) -> NetworkCondition:
         """获取当前网络条件"""
@@ -101,6 +118,58 @@ class EnhancedParticipant:
         """关闭异步通信服务"""
         await self.comm.close()
     
+    def xpow(self, k: int, p: int) -> int:
+        """
+        计算 x^k mod p，结果按指数缓存供多次协议调用复用
+        已缓存 x^(k-1) 时只需再做一次模乘
+        
+        Args:
+            k: 指数
+            p: 素数模数
+            
+        Returns:
+            x^k mod p
+        """
+        value = self.x_pow_cache.get(k)
+        if value is None:
+            prev = self.x_pow_cache.get(k - 1)
+            if prev is not None:
+                value = (prev * self.x) % p
+            else:
+                value = pow(self.x, k, p)
+            self.x_pow_cache[k] = value
+        return value
+    
+    def prss_one_share(self, peers: List[str], session: bytes, index: int) -> int:
+        """
+        由与peers的共享种子非交互地生成本方的1分享
+        
+        Args:
+            peers: 本次计算中其他参与方的名称
+            session: 本次协议实例的会话标识
+            index: 分享序号
+            
+        Returns:
+            本方的1分享，同一会话、同一序号下所有参与方的分享乘积为1 mod q
+        """
+        seeds = {peer: self.prss_seeds[peer] for peer in peers}
+        return prss_one_share(seeds, self.name, session, index, self.q)
+    
+    def prss_zero_share(self, peers: List[str], session: bytes, index: int) -> int:
+        """
+        由与peers的共享种子非交互地生成本方的0分享
+        
+        Args:
+            peers: 本次计算中其他参与方的名称
+            session: 本次协议实例的会话标识
+            index: 分享序号
+            
+        Returns:
+            本方的0分享，同一会话、同一序号下所有参与方的分享之和为0 mod q
+        """
+        seeds = {peer: self.prss_seeds[peer] for peer in peers}
+        return prss_zero_share(seeds, self.name, session, index, self.q)
+    
     async def send_value(self, other: 'EnhancedParticipant', value_str: Union[str, int, float]) -> bool:
         """
         异步发送字符串给other，经过网络模拟
@@ -113,24 +182,82 @@ class EnhancedParticipant:
         Returns:
             是否成功发送
         """
-        # 确保数据以整数形式发送，避免科学计数法
-        if isinstance(value_str, (int, float)):
-            data_to_send = str(int(value_str))
-        else:
-            try:
-                num = float(value_str)
-                if 'e' in value_str.lower() or '.' in value_str:
-                    data_to_send = str(int(num))
-                else:
-                    data_to_send = value_str
-            except (ValueError, TypeError):
-                data_to_send = value_str
+        data_to_send, value_bytes = self._encode_payload([value_str])
         
         # 模拟网络影响
         self.total_packets += 1
-        data_size = len(data_to_send.encode('utf-8'))
+        data_size = len(data_to_send)
         self.total_bytes_sent += data_size
         
+        return await self._send_with_retry(other, data_to_send, data_size, value_bytes)
+    
+    def _encode_payload(self, values: List[Union[str, int, float]]) -> Tuple[Union[bytes, str], int]:
+        """
+        将待发送的值编码为消息负载
+        整数以二进制编码(域元素定宽，负数或超宽值变长)，其余值回退为整数字符串
+        
+        Args:
+            values: 要发送的值列表
+            
+        Returns:
+            (负载, 值宽度)，值宽度为0表示文本负载
+        """
+        if all(type(v) in INTEGER_TYPES for v in values):
+            payload, value_bytes = self.comm.encode_values(values, self.value_bytes)
+        else:
+            payload = self.comm.BULK_SEPARATOR.join(self._encode_value(v) for v in values)
+            value_bytes = 0
+        if isinstance(payload, str):
+            payload = payload.encode('utf-8')
+        return payload, value_bytes
+    
+    @staticmethod
+    def _encode_value(value_str: Union[str, int, float]) -> str:
+        """
+        将待发送的值转换为整数字符串，避免科学计数法
+        
+        Args:
+            value_str: 要发送的值
+            
+        Returns:
+            待发送的字符串
+        """
+        if type(value_str) is int:
+            # 最常见的整数情况直接转换
+            return str(value_str)
+        if isinstance(value_str, (int, float)):
+            return str(int(value_str))
+        if isinstance(value_str, str) and value_str.isdigit():
+            # 纯数字字符串无需解析
+            return value_str
+        try:
+            # 先按整数精确解析(保留大整数精度)，失败再按科学计数法或小数解析
+            return str(int(value_str))
+        except (ValueError, TypeError):
+            try:
+                return str(int(float(value_str)))
+            except (ValueError, TypeError, OverflowError):
+                return value_str
+    
+    async def _send_with_retry(
+        self,
+        other: 'EnhancedParticipant',
+        data_to_send: bytes,
+        data_size: int,
+        value_bytes: int = 0
+    ) -> bool:
+        """
+        经过网络模拟发送数据，丢包时重试
+        
+        Args:
+            other: 接收消息的参与方
+            data_to_send: 待发送的负载
+            data_size: 数据大小(字节)
+            value_bytes: 定宽编码的值宽度，0表示文本负载
+            
+        Returns:
+            是否成功发送
+        """
         # 添加重试逻辑，提高成功率
         retries = 0
         while retries <= MAX_RETRY_COUNT:
@@ -141,7 +268,8 @@ class EnhancedParticipant:
                 await self.comm.send_data(
                     target_ip=other.host,
                     target_port=other.comm.port,
-                    data=data_to_send
+                    data=data_to_send,
+                    value_bytes=value_bytes
                 )
                 return True
             else:
@@ -174,6 +302,26 @@ class EnhancedParticipant:
         # 构建结果映射
         return {values_to_send[i][0]: results[i] for i in range(len(values_to_send))}
     
+    async def send_values_bulk(self, other: 'EnhancedParticipant', values: List[int]) -> bool:
+        """
+        将发往同一参与方的多个值合并为一条消息，经过网络模拟发送
+        
+        Args:
+            other: 接收消息的参与方
+            values: 要发送的整数值列表
+            
+        Returns:
+            是否成功发送
+        """
+        data_to_send, value_bytes = self._encode_payload(values)
+        
+        # 模拟网络影响，整条消息只计一个数据包
+        self.total_packets += 1
+        data_size = len(data_to_send)
+        self.total_bytes_sent += data_size
+        
+        return await self._send_with_retry(other, data_to_send, data_size, value_bytes)
+    
     async def recv_values(self, expected_count: int, wait_sec: float = DEFAULT_RECV_TIMEOUT) -> List[int]:
         """
         异步接收指定数量的值，使用自适应超时
@@ -198,21 +346,38 @@ class EnhancedParticipant:
             logger.warning(f"{self.name} 接收数据超时 (超时时间: {adjusted_timeout}s)")
             raise
     
-    def calculate_timeout(self, base_timeout: float) -> float:
+    async def recv_values_bulk(self, expected_count: int, wait_sec: float = DEFAULT_RECV_TIMEOUT) -> List[List[int]]:
         """
-        计算自适应超时时间
+        异步接收指定数量的批量消息，使用自适应超时
         
         Args:
-            base_timeout: 基础超时时间
+            expected_count: 期望接收的消息数量
+            wait_sec: 基础超时时间（秒）
             
         Returns:
-            调整后的超时时间
+            每条消息对应一个整数列表
         """
-        condition = self.network_simulator.condition
+        adjusted_timeout = self.calculate_timeout(wait_sec)
         
+        try:
+            return await self.comm.recv_values_bulk(expected_count, adjusted_timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"{self.name} 接收数据超时 (超时时间: {adjusted_timeout}s)")
+            raise
+    
+    @staticmethod
+    def _timeout_multiplier(condition: NetworkCondition) -> Optional[float]:
+        """
+        根据网络条件计算超时倍数，本地网络返回None表示直接使用基础超时
+        
+        Args:
+            condition: 网络条件
+            
+        Returns:
+            超时倍数
+        """
         if condition.name == "本地网络":
-            # 本地网络使用基础超时
-            return base_timeout
+            return None
             
         # 根据网络条件的不同属性来调整超时时间
         # 1. 根据最大延迟调整
@@ -230,6 +395,28 @@ class EnhancedParticipant:
         if condition.bandwidth_limit_kbps and condition.bandwidth_limit_kbps < 500:
             bandwidth_factor = 1.5  # 低带宽需要更长超时
         
+        return delay_factor * loss_factor * bandwidth_factor
+    
+    def calculate_timeout(self, base_timeout: float) -> float:
+        """
+        计算自适应超时时间
+        超时倍数只在网络条件变化时重新计算
+        
+        Args:
+            base_timeout: 基础超时时间
+            
+        Returns:
+            调整后的超时时间
+        """
+        condition = self.network_simulator.condition
+        if condition is not self._timeout_condition:
+            self._timeout_condition = condition
+            self._timeout_factor = self._timeout_multiplier(condition)
+        
+        if self._timeout_factor is None:
+            # 本地网络使用基础超时
+            return base_timeout
+        
         # 计算最终超时时间，确保在有效范围内
-        timeout = base_timeout * delay_factor * loss_factor * bandwidth_factor
+        timeout = base_timeout * self._timeout_factor
         return max(MIN_RECV_TIMEOUT, min(timeout, MAX_RECV_TIMEOUT))
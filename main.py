@@ -25,7 +25,7 @@ try:
         DEFAULT_PRIME, DEFAULT_GENERATOR, 
         DEFAULT_X_STAR, MIN_PARTIES, MAX_PARTIES
     )
-    from experiment.utils.utils import setup_logging
+    from experiment.utils.utils import setup_logging, install_fast_loop
     from experiment.protocols.protocol_extension import secure_lagrange_interpolation
 except ImportError:
     # 如果上面的导入失败，尝试其他导入方式
@@ -34,7 +34,7 @@ except ImportError:
         DEFAULT_PRIME, DEFAULT_GENERATOR, 
         DEFAULT_X_STAR, MIN_PARTIES, MAX_PARTIES
     )
-    from utils.utils import setup_logging
+    from utils.utils import setup_logging, install_fast_loop
     from protocols.protocol_extension import secure_lagrange_interpolation
 
 # 初始化logger
@@ -171,6 +171,9 @@ def main() -> None:
         os.makedirs(log_dir, exist_ok=True)
         setup_logging(filename='lagrange_protocol.log', log_dir=log_dir)
         
+        # 使用uvloop加速（如果可用）
+        install_fast_loop()
+        
         # 尝试从命令行参数获取参与方数量
         party_num = None
         if len(sys.argv) > 1:
@@ -6,6 +6,7 @@
 __all__ = [
     'port_manager',
     'cleanup_resources',
+    'ParticipantPool',
     'secure_lagrange_interpolation',
     'four_party_compute',
     'create_participant'
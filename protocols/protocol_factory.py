@@ -3,6 +3,7 @@
 """
 
 import os
+import functools
 import logging
 from typing import Type, Union, Any
 
@@ -17,29 +18,44 @@ from core.participant_enhanced import EnhancedParticipant
 
 logger = logging.getLogger('lagrange_protocol')
 
+@functools.lru_cache(maxsize=None)
+def _participant_class_for(network_simulation: str) -> Type[Union[Participant, EnhancedParticipant]]:
+    """
+    按USE_NETWORK_SIMULATION的取值返回参与方类，每种取值只解析一次
+    
+    Args:
+        network_simulation: 环境变量USE_NETWORK_SIMULATION的原始取值
+        
+    Returns:
+        参与方类
+    """
+    if network_simulation.lower() == 'true':
+        logger.debug("使用增强参与方类(带网络模拟)")
+        return EnhancedParticipant
+    else:
+        logger.debug("使用标准参与方类")
+        return Participant
+
 def get_participant_class() -> Type[Union[Participant, EnhancedParticipant]]:
     """
     获取当前应使用的参与方类
     
-    根据环境变量决定是否使用具有网络模拟功能的增强参与方类
+    根据环境变量决定是否使用具有网络模拟功能的增强参与方类，
+    每次调用都重新读取环境变量，运行中修改USE_NETWORK_SIMULATION会立即生效
     
     Returns:
         参与方类
     """
     # 检查环境变量，决定是否使用网络模拟
-    use_network_simulation = os.environ.get('USE_NETWORK_SIMULATION', '').lower() == 'true'
-    
-    if use_network_simulation:
-        logger.info("使用增强参与方类(带网络模拟)")
-        return EnhancedParticipant
-    else:
-        logger.info("使用标准参与方类")
-        return Participant
+    return _participant_class_for(os.environ.get('USE_NETWORK_SIMULATION', ''))
 
 def create_participant(*args, **kwargs) -> Union[Participant, EnhancedParticipant]:
     """
     创建参与方实例
     
+    显式传入network_condition时直接创建增强参与方，不再依赖环境变量，
+    便于在同一进程内依次运行不同网络条件的测试
+    
     Args:
         *args: 传递给参与方构造函数的位置参数
         **kwargs: 传递给参与方构造函数的关键字参数
@@ -47,11 +63,16 @@ def create_participant(*args, **kwargs) -> Union[Participant, EnhancedParticipan
     Returns:
         参与方实例
     """
+    # 显式指定网络条件时使用增强参与方
+    if kwargs.get('network_condition') is not None:
+        return EnhancedParticipant(*args, **kwargs)
+    kwargs.pop('network_condition', None)
+    
     # 获取当前应使用的参与方类
     participant_class = get_participant_class()
     
     # 如果使用增强参与方，检查是否需要添加网络类型参数
-    if participant_class == EnhancedParticipant and 'network_condition' not in kwargs:
+    if participant_class.needs_network_condition:
         # 从环境变量获取网络类型
         network_type = os.environ.get('NETWORK_TYPE', 'local')
         kwargs['network_condition'] = network_type
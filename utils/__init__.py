@@ -3,14 +3,23 @@
 """
 
 # 直接导入需要的函数，避免循环引用
-from .utils import setup_logging, mini_one_share, mini_zero_share, generate_triples
+from .utils import (
+    setup_logging, install_fast_loop, dumps_line, dumps_pretty, generate_triples, to_field, field_inverse, batch_invert,
+    prss_one_share, prss_zero_share
+)
 
 # 按需导入配置参数，需要时直接导入对应变量
 # 避免在此处全部导入造成循环引用问题
 
 __all__ = [
     'setup_logging', 
-    'mini_one_share', 
-    'mini_zero_share', 
-    'generate_triples'
+    'install_fast_loop',
+    'dumps_line',
+    'dumps_pretty',
+    'generate_triples',
+    'to_field',
+    'field_inverse',
+    'batch_invert',
+    'prss_one_share',
+    'prss_zero_share'
 ]
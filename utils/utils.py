@@ -2,13 +2,30 @@
 工具模块 - 包含辅助函数和通用功能
 """
 
+import asyncio
+import contextlib
+import functools
 import logging
-import random
+import sys
+import hashlib
+import json
 import os
-from typing import List, Tuple, Union, Optional
+from typing import Any, List, Tuple, Dict, Union, Optional
+
+# gmpy2为可选依赖，可用时使用GMP大整数加速模运算
+try:
+    import gmpy2
+except ImportError:
+    gmpy2 = None
+
+# orjson为可选依赖，未安装时回退到标准库json
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 # 配置logging
-def setup_logging(filename: str = 'lagrange_protocol.log', level=logging.INFO, console_output: bool = True, log_dir: str = None) -> None:
+def setup_logging(filename: str = 'lagrange_protocol.log', level=logging.INFO, console_output: bool = True, log_dir: str = None) -> logging.Logger:
     """
     配置日志系统
     
@@ -17,6 +34,9 @@ def setup_logging(filename: str = 'lagrange_protocol.log', level=logging.INFO, c
         level: 日志级别
         console_output: 是否输出到控制台
         log_dir: 日志目录，如果指定则在该目录下创建日志文件
+        
+    Returns:
+        协议使用的logger
     """
     # 如果指定了日志目录，确保目录存在
     if log_dir:
@@ -34,109 +54,191 @@ def setup_logging(filename: str = 'lagrange_protocol.log', level=logging.INFO, c
         encoding='utf-8'
     )
     
-    # 如果需要控制台输出
-    if console_output:
+    # 如果需要控制台输出；多次调用时不重复添加控制台handler，避免每条日志重复输出
+    root = logging.getLogger('')
+    has_console = any(
+        isinstance(h, logging.StreamHandler) and getattr(h, 'stream', None) is sys.stderr
+        for h in root.handlers
+    )
+    if console_output and not has_console:
         console = logging.StreamHandler()
         console.setLevel(level)
         formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(threadName)s - %(message)s')
         console.setFormatter(formatter)
-        logging.getLogger('').addHandler(console)
+        root.addHandler(console)
     
     return logging.getLogger('lagrange_protocol')
 
-def generate_triples(n: int) -> List[Tuple[int, ...]]:
+def install_fast_loop() -> None:
+    """
+    安装uvloop事件循环策略(如果可用)，需在asyncio.run之前调用
+    uvloop基于libuv实现，网络I/O密集的测试驱动可获得更低的调度开销
+    """
+    with contextlib.suppress(ImportError):
+        import uvloop
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+
+def dumps_line(obj: Any) -> bytes:
+    """将对象序列化为单行JSON字节串（用于NDJSON中间结果）"""
+    if orjson is not None:
+        return orjson.dumps(obj) + b'\n'
+    return (json.dumps(obj, separators=(',', ':'), ensure_ascii=False) + '\n').encode('utf-8')
+
+def dumps_pretty(obj: Any) -> bytes:
+    """将对象序列化为带缩进的JSON字节串"""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2)
+    return json.dumps(obj, indent=2, ensure_ascii=False).encode('utf-8')
+
+@functools.lru_cache(maxsize=32)
+def generate_triples(n: int) -> Tuple[Tuple[int, ...], ...]:
     """
     将n个数划分为若干个三元组或四元组
+    划分只取决于n，结果按n缓存，以不可变元组返回供多次调用共享
     
     Args:
         n: 参与方数量
         
     Returns:
-        包含三元组和四元组的列表
+        包含三元组和四元组的元组
     """
     triples = []
     
-    if n % 2 == 1:  # 奇数情况，全部是三元组
-        for i in range(1, n + 1):
-            remaining = [num for num in range(1, n + 1) if num != i]
-            pairs = []
-            # 每两个一组，确保没有重叠
-            for j in range(0, len(remaining), 2):
-                pair = tuple(remaining[j:j + 2])
-                pairs.append(pair)
-            # 添加i到每个pair中，形成三元组
-            for pair in pairs:
-                triple = (i,) + pair
-                triples.append(triple)
-    else:  # 偶数情况，有一个四元组
-        for i in range(1, n + 1):
-            remaining = [num for num in range(1, n + 1) if num != i]
-            pairs = []
-            # 每两个一组，确保没有重叠
-            for j in range(0, len(remaining) - 1, 2):
-                pair = tuple(remaining[j:j + 2])
-                pairs.append(pair)
-            # 添加i到每个pair中，形成三元组
-            for pair in pairs:
-                triple = (i,) + pair
-                triples.append(triple)
-            # 处理剩余的元素
-            if len(remaining) % 2 == 1:
-                remaining_element = remaining[-1]
-                triples[-1] = triples[-1] + (remaining_element,)
-    
-    return triples
+    for i in range(1, n + 1):
+        remaining = [*range(1, i), *range(i + 1, n + 1)]
+        # 每两个一组，确保没有重叠；以步长切片配对，避免逐个元素的Python循环
+        group = list(zip([i] * (len(remaining) // 2), remaining[0::2], remaining[1::2]))
+        # 偶数情况剩余一个元素，并入最后一组形成四元组
+        if len(remaining) % 2 == 1:
+            group[-1] = group[-1] + (remaining[-1],)
+        triples.extend(group)
+    
+    return tuple(triples)
 
-def mini_one_share(group, size: int = 3) -> List[int]:
+def to_field(*values: int) -> Tuple:
     """
-    一次性生成乘积为1的随机数列表
+    将域元素转换为模运算热路径使用的大整数类型
     
     Args:
-        group: 循环群对象
-        size: 要生成的随机数数量，默认为3
+        values: 要转换的整数
         
     Returns:
-        长度为size的列表，乘积为1 mod p
+        gmpy2可用时为mpz元组，否则为原整数元组
     """
-    if size < 2:
-        raise ValueError("Size must be at least 2")
-    
-    # 生成size-1个随机数
-    shares = [random.randint(1, group.p-1) for _ in range(size-1)]
-    
-    # 计算它们的乘积
-    product = 1
-    for share in shares:
-        product = (product * share) % group.p
-    
-    # 计算最后一个数，使得所有数的乘积为1
-    last_share = group.mod_inverse(product)
-    shares.append(last_share)
+    if gmpy2 is None:
+        return values
+    return tuple(gmpy2.mpz(v) for v in values)
+
+def field_inverse(a: int, p: int) -> int:
+    """
+    计算a在模p下的逆元，gmpy2可用时使用GMP实现
     
-    return shares
+    Args:
+        a: 要求逆元的元素
+        p: 素数模数
+        
+    Returns:
+        a在模p下的逆元
+    """
+    if gmpy2 is not None:
+        return gmpy2.invert(a, p)
+    return pow(a, -1, p)
 
-def mini_zero_share(group, size: int = 3) -> List[int]:
+def batch_invert(values: List[int], p: int) -> List[int]:
     """
-    一次性生成和为0的随机数列表
+    Montgomery批量求逆：只做一次模逆和约3(n-1)次模乘，求出所有元素在模p下的逆元
     
     Args:
-        group: 循环群对象
-        size: 要生成的随机数数量，默认为3
+        values: 要求逆元的元素列表，均不能为0 mod p
+        p: 素数模数
         
     Returns:
-        长度为size的列表，和为0 mod p
+        与values等长的逆元列表
+        
+    Raises:
+        ValueError, ZeroDivisionError: 存在不可逆元素时
+    """
+    n = len(values)
+    if n == 0:
+        return []
+    
+    # prefix[i] = Π_{j<i} values[j]
+    prefix = [1] * n
+    acc = 1
+    for i, v in enumerate(values):
+        prefix[i] = acc
+        acc = (acc * v) % p
+    
+    # 对总乘积求一次逆，再由后向前逐个还原
+    acc_inv = field_inverse(acc, p)
+    inverses = [0] * n
+    for i in range(n - 1, -1, -1):
+        inverses[i] = int((acc_inv * prefix[i]) % p)
+        acc_inv = (acc_inv * values[i]) % p
+    return inverses
+
+def prss_value(seed: bytes, session: bytes, index: int, p: int) -> int:
     """
-    if size < 2:
-        raise ValueError("Size must be at least 2")
+    由成对共享种子派生伪随机域元素 (SHAKE-256作为伪随机函数)
     
-    # 生成size-1个随机数
-    shares = [random.randint(0, group.p-1) for _ in range(size-1)]
+    Args:
+        seed: 两个参与方共享的种子
+        session: 本次协议实例的会话标识
+        index: 分享序号
+        p: 素数模数
+        
+    Returns:
+        [1, p-1] 范围内的伪随机数
+    """
+    # 多取16字节使取模偏差可忽略
+    nbytes = (p.bit_length() + 7) // 8 + 16
+    digest = hashlib.shake_256(seed + session + index.to_bytes(4, 'big')).digest(nbytes)
+    return int.from_bytes(digest, 'big') % (p - 1) + 1
+
+def prss_one_share(seeds: Dict[str, bytes], name: str, session: bytes, index: int, p: int) -> int:
+    """
+    伪随机1分享(PRSS)：由成对种子非交互地得到本方的分享，所有参与方的分享乘积为1 mod p
     
-    # 计算它们的和
-    total = sum(shares) % group.p
+    每对参与方 (a, b) 共享种子派生的 F_ab，名称较小的一方乘以 F_ab，较大的一方乘以 F_ab 的逆，
+    所有参与方相乘时成对抵消
     
-    # 计算最后一个数，使得所有数的和为0
-    last_share = (-total) % group.p
-    shares.append(last_share)
+    Args:
+        seeds: 本方与其他参与方的共享种子，键为对方名称
+        name: 本方名称
+        session: 本次协议实例的会话标识
+        index: 分享序号，同一会话内不同的1分享使用不同序号
+        p: 素数模数
+        
+    Returns:
+        本方的1分享
+    """
+    numerator = 1
+    denominator = 1
+    for other, seed in seeds.items():
+        value = prss_value(seed, session, index, p)
+        if name < other:
+            numerator = (numerator * value) % p
+        else:
+            denominator = (denominator * value) % p
+    return int((numerator * field_inverse(denominator, p)) % p)
+
+def prss_zero_share(seeds: Dict[str, bytes], name: str, session: bytes, index: int, p: int) -> int:
+    """
+    伪随机0分享(PRZS)：由成对种子非交互地得到本方的分享，所有参与方的分享之和为0 mod p
     
-    return shares
+    Args:
+        seeds: 本方与其他参与方的共享种子，键为对方名称
+        name: 本方名称
+        session: 本次协议实例的会话标识
+        index: 分享序号，同一会话内不同的0分享使用不同序号
+        p: 素数模数
+        
+    Returns:
+        本方的0分享
+    """
+    total = 0
+    for other, seed in seeds.items():
+        # 与1分享使用不同的派生域，避免同序号的两种分享相关
+        value = prss_value(seed, b'zero' + session, index, p)
+        total += value if name < other else -value
+    return total % p